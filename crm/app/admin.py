@@ -1,3 +1,18 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Client
+from .promotion import promote_clients
+
+
+@admin.register(Client)
+class ClientAdmin(admin.ModelAdmin):
+    list_display = "surname", "name", "middle_name", "phone_num", "email", "advert", "active"
+    list_filter = "active", "advert"
+    list_select_related = ("advert",)
+    search_fields = "surname", "name", "email", "phone_num"
+    actions = ("promote",)
+
+    @admin.action(description="Перевести в активные")
+    def promote(self, request, queryset):
+        count = promote_clients(queryset)
+        self.message_user(request, f"Переведено в активные: {count}")
@@ -0,0 +1,131 @@
+from django.http import Http404
+from django.urls import path
+from django.views.generic.detail import SingleObjectMixin
+from django.views.generic.list import MultipleObjectMixin
+
+from .conditional import conditional_response, set_validators
+from .roles import AsyncRoleRequiredMixin
+from .statistics import aget_statistics
+from .views import (
+    AdvertsListView,
+    AdvertDetailView,
+    ContractsListView,
+    ContractDetailView,
+    ServicesListView,
+    ServiceDetailView,
+    PotentialClientListView,
+    PotentialClientDetailView,
+    ActiveClientListView,
+    ActiveClientDetailView,
+    StatisticsView,
+)
+
+
+class AsyncListMixin:
+    async def get(self, request, *args, **kwargs):
+        etag, last_modified = await self.aget_validators()
+        response, timestamp = conditional_response(request, etag, last_modified)
+        if response is None:
+            self.object_list = self.get_queryset()
+            fragment, rows = await self.aget_fragment()
+            # Pagination and the fragment cache are done above; go straight to
+            # the generic context instead of their synchronous get_context_data.
+            context = MultipleObjectMixin.get_context_data(self, object_list=rows, **fragment)
+            response = self.render_to_response(context)
+        return set_validators(response, etag, timestamp)
+
+
+class AsyncDetailMixin:
+    async def aget_object(self):
+        queryset = self.get_queryset()
+        try:
+            return await queryset.aget(pk=self.kwargs[self.pk_url_kwarg])
+        except queryset.model.DoesNotExist:
+            raise Http404(f"No {queryset.model._meta.verbose_name} found matching the query")
+
+    async def get(self, request, *args, **kwargs):
+        etag, last_modified = await self.aget_validators()
+        if etag is None:
+            raise Http404
+        response, timestamp = conditional_response(request, etag, last_modified)
+        if response is None:
+            self.object = await self.aget_object()
+            response = self.render_to_response(SingleObjectMixin.get_context_data(self, object=self.object))
+        return set_validators(response, etag, timestamp)
+
+
+class AsyncAdvertsListView(AsyncRoleRequiredMixin, AsyncListMixin, AdvertsListView):
+    pass
+
+
+class AsyncAdvertDetailView(AsyncRoleRequiredMixin, AsyncDetailMixin, AdvertDetailView):
+    pass
+
+
+class AsyncContractsListView(AsyncRoleRequiredMixin, AsyncListMixin, ContractsListView):
+    pass
+
+
+class AsyncContractDetailView(AsyncRoleRequiredMixin, AsyncDetailMixin, ContractDetailView):
+    pass
+
+
+class AsyncServicesListView(AsyncRoleRequiredMixin, AsyncListMixin, ServicesListView):
+    pass
+
+
+class AsyncServiceDetailView(AsyncRoleRequiredMixin, AsyncDetailMixin, ServiceDetailView):
+    pass
+
+
+class AsyncPotentialClientListView(AsyncRoleRequiredMixin, AsyncListMixin, PotentialClientListView):
+    pass
+
+
+class AsyncPotentialClientDetailView(
+    AsyncRoleRequiredMixin,
+    AsyncDetailMixin,
+    PotentialClientDetailView,
+):
+    pass
+
+
+class AsyncActiveClientListView(AsyncListMixin, ActiveClientListView):
+    pass
+
+
+class AsyncActiveClientDetailView(AsyncDetailMixin, ActiveClientDetailView):
+    pass
+
+
+class AsyncStatisticsView(StatisticsView):
+    async def get(self, request, *args, **kwargs):
+        self.object_list = await aget_statistics()
+        return self.render_to_response(MultipleObjectMixin.get_context_data(self, object_list=self.object_list))
+
+
+ASYNC_VARIANTS = {
+    AdvertsListView: AsyncAdvertsListView,
+    AdvertDetailView: AsyncAdvertDetailView,
+    ContractsListView: AsyncContractsListView,
+    ContractDetailView: AsyncContractDetailView,
+    ServicesListView: AsyncServicesListView,
+    ServiceDetailView: AsyncServiceDetailView,
+    PotentialClientListView: AsyncPotentialClientListView,
+    PotentialClientDetailView: AsyncPotentialClientDetailView,
+    ActiveClientListView: AsyncActiveClientListView,
+    ActiveClientDetailView: AsyncActiveClientDetailView,
+    StatisticsView: AsyncStatisticsView,
+}
+
+
+def select_async_views(patterns, names):
+    # names are route names from app/urls.py, or "all".
+    selected = []
+    for pattern in patterns:
+        view_class = getattr(pattern.callback, "view_class", None)
+        variant = ASYNC_VARIANTS.get(view_class)
+        if variant is not None and ("all" in names or pattern.name in names):
+            pattern = path(str(pattern.pattern), variant.as_view(), name=pattern.name)
+        selected.append(pattern)
+    return selected
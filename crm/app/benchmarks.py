@@ -0,0 +1,169 @@
+import asyncio
+import http.client
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db import close_old_connections, connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from .metrics import percentile
+from .middleware import QueryTimer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def test_host():
+    # The test clients always send Host: testserver.
+    return override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"])
+
+
+def benchmark_user(username=None):
+    users = User.objects.filter(username=username) if username else User.objects.filter(is_superuser=True)
+    user = users.first()
+    if user is None:
+        raise CommandError("No user to log in as; pass --username or create a superuser")
+    return user
+
+
+def route_path(pattern):
+    kwargs = {}
+    if "pk" in pattern.pattern.converters:
+        view_class = pattern.callback.view_class
+        queryset = view_class.queryset if view_class.queryset is not None else view_class.model.objects.all()
+        pk = queryset.values_list("pk", flat=True).first()
+        if pk is None:
+            raise CommandError(f"{pattern.name} needs at least one {queryset.model.__name__}")
+        kwargs["pk"] = pk
+    return reverse(f"app:{pattern.name}", kwargs=kwargs)
+
+
+def check_response(path, response):
+    if response.status_code != 200:
+        raise CommandError(f"{path} returned {response.status_code}")
+
+
+def wsgi_load(user, path, requests, concurrency):
+    # Each worker thread has its own client and, like a threaded WSGI
+    # server, its own database connection.
+    login = Client()
+    login.force_login(user)
+    local = threading.local()
+
+    def fetch(_):
+        if not hasattr(local, "client"):
+            local.client = Client()
+            local.client.cookies = login.cookies
+        start = time.perf_counter()
+        check_response(path, local.client.get(path))
+        # The test client skips the request_finished handler that applies
+        # CONN_MAX_AGE; run it as a real WSGI server would.
+        close_old_connections()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        timings = list(executor.map(fetch, range(requests)))
+    return time.perf_counter() - start, timings
+
+
+def client_load(user, path, requests):
+    # Sequential requests in this thread, with the queries of each counted
+    # on every database alias.
+    client = Client()
+    client.force_login(user)
+    timings, queries = [], []
+    for _ in range(requests):
+        timer = QueryTimer()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timer))
+            start = time.perf_counter()
+            response = client.get(path)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            timings.append(time.perf_counter() - start)
+        check_response(path, response)
+        queries.append(timer.count)
+    return timings, queries
+
+
+def session_cookie(user):
+    # A real session in the database, usable by a separately running server.
+    client = Client()
+    client.force_login(user)
+    return "; ".join(f"{name}={morsel.value}" for name, morsel in client.cookies.items())
+
+
+def http_load(base_url, cookie, path, requests, concurrency):
+    # Against runserver or gunicorn; every worker thread keeps one connection open.
+    url = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+    prefix = url.path.rstrip("/")
+    local = threading.local()
+
+    def fetch(_):
+        if not hasattr(local, "connection"):
+            local.connection = connection_class(url.netloc, timeout=60)
+        start = time.perf_counter()
+        local.connection.request("GET", prefix + path, headers={"Cookie": cookie})
+        response = local.connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise CommandError(f"{path} returned {response.status}")
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        timings = list(executor.map(fetch, range(requests)))
+    return time.perf_counter() - start, timings
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def latency_summary(timings):
+    return {
+        f"p{int(fraction * 100)}_ms": round(percentile(timings, fraction) * 1000, 3)
+        for fraction in (0.5, 0.95, 0.99)
+    }
+
+
+async def asgi_load(user, path, requests, concurrency):
+    client = AsyncClient()
+    await client.aforce_login(user)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch():
+        async with semaphore:
+            start = time.perf_counter()
+            check_response(path, await client.get(path))
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    timings = await asyncio.gather(*(fetch() for _ in range(requests)))
+    return time.perf_counter() - start, timings
+
+
+def format_load(elapsed, timings):
+    p50, p95, p99 = latency_summary(timings).values()
+    return (
+        f"{len(timings) / elapsed:>9.1f} req/s  "
+        f"p50 {p50:>7.2f} ms  p95 {p95:>7.2f} ms  p99 {p99:>7.2f} ms"
+    )
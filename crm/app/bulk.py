@@ -0,0 +1,221 @@
+import json
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.db import transaction
+from django.db.models import PROTECT, Count
+from django.forms import modelform_factory
+from django.http import JsonResponse
+
+from . import statistics
+from .cache import bump_generation
+
+ACTIONS = ("create", "update", "delete")
+
+
+class BulkRequestError(Exception):
+    pass
+
+
+class BulkRowErrors(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def parse_operations(body, max_rows):
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise BulkRequestError("Тело запроса должно быть в формате JSON")
+    if not isinstance(payload, dict) or not set(payload) <= set(ACTIONS):
+        raise BulkRequestError("Ожидается объект с ключами create, update и delete")
+    operations = {action: payload.get(action) or [] for action in ACTIONS}
+    if not all(isinstance(rows, list) for rows in operations.values()):
+        raise BulkRequestError("create, update и delete должны быть списками")
+    if sum(len(rows) for rows in operations.values()) > max_rows:
+        raise BulkRequestError(f"Не более {max_rows} строк за запрос")
+    return operations
+
+
+@lru_cache
+def model_form(model, fields):
+    return modelform_factory(model, fields=fields)
+
+
+def is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def message(text, code):
+    return [{"message": text, "code": code}]
+
+
+def row_error(action, row, errors, pk=None):
+    error = {"action": action, "row": row, "errors": errors}
+    if pk is not None:
+        error["id"] = pk
+    return error
+
+
+class BulkOperationsMixin:
+    # POST {"create": [{...}], "update": [{"id": 1, ...}], "delete": [2, 3]}.
+    # Every row is validated with a ModelForm and all of them are applied in
+    # one transaction; if any row fails, nothing is written and the response
+    # lists the errors of each failed row.
+    model = None
+    create_fields = ()
+    update_fields = ()
+    # Statistics snapshot totals a deleted row is subtracted from, as
+    # {"advert_budget": "budget"}.
+    snapshot_fields = {}
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({
+            "create_fields": list(self.create_fields),
+            "update_fields": list(self.update_fields),
+            "max_rows": settings.BULK_MAX_ROWS,
+        })
+
+    def post(self, request, *args, **kwargs):
+        try:
+            operations = parse_operations(request.body, settings.BULK_MAX_ROWS)
+            with transaction.atomic():
+                result = self.apply(**operations)
+        except BulkRequestError as error:
+            return JsonResponse({"error": str(error)}, status=400)
+        except BulkRowErrors as error:
+            return JsonResponse({"errors": error.errors}, status=400)
+        if result["created"] or result["updated"]:
+            bump_generation(self.model)
+        return JsonResponse(result)
+
+    def apply(self, create, update, delete):
+        errors = []
+        created = self.validate_create(create, errors)
+        updated, fields = self.validate_update(update, errors)
+        update_ids = {row["id"] for row in update if isinstance(row, dict) and is_id(row.get("id"))}
+        deleted = self.validate_delete(delete, update_ids, errors)
+        if errors:
+            raise BulkRowErrors(errors)
+
+        if created:
+            created = self.create_objects(created)
+        if updated:
+            self.update_objects(updated, fields)
+        if deleted:
+            self.delete_objects(deleted)
+        return {
+            "created": [obj.pk for obj in created],
+            "updated": [obj.pk for obj in updated],
+            "deleted": sorted(deleted),
+        }
+
+    def row_object(self, action, row, data, allowed, errors, instance=None):
+        pk = None if instance is None else instance.pk
+        if not isinstance(data, dict):
+            errors.append(row_error(action, row, {NON_FIELD_ERRORS: message("Ожидается JSON-объект", "invalid")}, pk))
+            return None
+        unknown = sorted(set(data) - set(allowed))
+        if unknown:
+            errors.append(row_error(action, row, {name: message("Это поле нельзя задать", "unknown") for name in unknown}, pk))
+            return None
+        # An update only touches the fields present in its row.
+        fields = allowed if instance is None else tuple(name for name in allowed if name in data)
+        form = model_form(self.model, tuple(fields))(data=data, instance=instance)
+        if not form.is_valid():
+            errors.append(row_error(action, row, form.errors.get_json_data(), pk))
+            return None
+        return form.save(commit=False)
+
+    def validate_create(self, rows, errors):
+        objects = (self.row_object("create", row, data, self.create_fields, errors) for row, data in enumerate(rows))
+        return [obj for obj in objects if obj is not None]
+
+    def validate_update(self, rows, errors):
+        ids = [data.get("id") for data in rows if isinstance(data, dict)]
+        instances = self.model.objects.select_for_update().in_bulk([pk for pk in ids if is_id(pk)])
+        objects, fields, seen = [], set(), set()
+        for row, data in enumerate(rows):
+            pk = data.get("id") if isinstance(data, dict) else None
+            if not is_id(pk):
+                errors.append(row_error("update", row, {"id": message("Укажите числовой id", "required")}))
+            elif pk in seen:
+                errors.append(row_error("update", row, {"id": message("Запись уже изменяется", "duplicate")}, pk))
+            elif pk not in instances:
+                errors.append(row_error("update", row, {"id": message("Запись не найдена", "not_found")}, pk))
+            else:
+                seen.add(pk)
+                values = {name: value for name, value in data.items() if name != "id"}
+                obj = self.row_object("update", row, values, self.update_fields, errors, instances[pk])
+                if obj is not None:
+                    objects.append(obj)
+                    fields.update(values)
+        return objects, sorted(fields)
+
+    def validate_delete(self, ids, update_ids, errors):
+        candidates = []
+        for row, pk in enumerate(ids):
+            if not is_id(pk):
+                errors.append(row_error("delete", row, {"id": message("Укажите числовой id", "invalid")}))
+            elif pk in update_ids:
+                errors.append(row_error("delete", row, {"id": message("Запись одновременно изменяется", "conflict")}, pk))
+            else:
+                candidates.append((row, pk))
+        if not candidates:
+            return {}
+        # Locked, so no client can start referencing a row between the check
+        # below and the DELETE.
+        existing = {
+            pk: values
+            for pk, *values in (
+                self.model.objects
+                .select_for_update()
+                .filter(pk__in=[pk for _, pk in candidates])
+                .values_list("pk", *self.snapshot_fields.values())
+            )
+        }
+        protected = self.protected_counts(existing)
+        for row, pk in candidates:
+            if pk not in existing:
+                errors.append(row_error("delete", row, {"id": message("Запись не найдена", "not_found")}, pk))
+            elif protected[pk]:
+                text = f"Запись используется ({protected[pk]}), удаление запрещено"
+                errors.append(row_error("delete", row, {NON_FIELD_ERRORS: message(text, "protected")}, pk))
+        return existing
+
+    def protected_counts(self, ids):
+        # What a ProtectedError would be raised for, counted per row with one
+        # query per PROTECT relation instead of loading the related objects.
+        counts = Counter()
+        if not ids:
+            return counts
+        for relation in self.model._meta.related_objects:
+            if relation.on_delete is PROTECT:
+                counts.update(dict(
+                    relation.related_model._base_manager
+                    .filter(**{f"{relation.field.name}__in": ids})
+                    .order_by()
+                    .values_list(relation.field.attname)
+                    .annotate(count=Count("pk"))
+                ))
+        return counts
+
+    def create_objects(self, objects):
+        return self.model.objects.bulk_create(objects)
+
+    def update_objects(self, objects, fields):
+        self.model.objects.bulk_touch(objects, fields)
+
+    def delete_objects(self, rows):
+        # The collector handles cascades and sends post_delete as usual (the
+        # fragment cache is invalidated there); only the snapshot totals are
+        # subtracted here, once for all rows.
+        with statistics.bulk_delete():
+            self.model._base_manager.filter(pk__in=rows).delete()
+        statistics.update_snapshot(**{
+            total: -sum(values[index] for values in rows.values())
+            for index, total in enumerate(self.snapshot_fields)
+        })
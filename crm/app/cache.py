@@ -0,0 +1,103 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.template.loader import render_to_string
+
+
+def fragment_cache():
+    return caches[settings.FRAGMENT_CACHE_ALIAS]
+
+
+def generation_key(model):
+    return f"generation:{model._meta.label_lower}"
+
+
+def get_generations(*models):
+    cache = fragment_cache()
+    keys = [generation_key(model) for model in models]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # A nanosecond timestamp never repeats a generation that was
+            # evicted, so fragments cached under it stay unreachable.
+            cache.add(key, time.time_ns(), timeout=None)
+            generations[key] = cache.get(key)
+    return tuple(generations[key] for key in keys)
+
+
+async def aget_generations(*models):
+    cache = fragment_cache()
+    keys = [generation_key(model) for model in models]
+    generations = await cache.aget_many(keys)
+    for key in keys:
+        if key not in generations:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+            generations[key] = await cache.aget(key)
+    return tuple(generations[key] for key in keys)
+
+
+def bump_generation(model):
+    cache = fragment_cache()
+    try:
+        cache.incr(generation_key(model))
+    except ValueError:
+        cache.set(generation_key(model), time.time_ns(), timeout=None)
+
+
+class FragmentCacheMixin:
+    fragment_template_name = None
+    fragment_models = ()
+
+    def fragment_rows(self):
+        # Cached rows are built from the primary: a lagging replica would store
+        # pre-write rows under the generation the write has just bumped, and
+        # every reader would get them until the fragment expires.
+        return self.object_list.using(DEFAULT_DB_ALIAS)
+
+    def fragment_key(self, generations):
+        cursor = self.request.GET.get(self.cursor_param, "")
+        parts = [self.__class__.__name__, self.get_page_size(), cursor, *generations]
+        digest = hashlib.md5(":".join(map(str, parts)).encode()).hexdigest()
+        return f"rows:{digest}"
+
+    def get_fragment_key(self):
+        return self.fragment_key(get_generations(*self.fragment_models))
+
+    def render_fragment(self, rows, next_cursor, prev_cursor):
+        return {
+            "rows_html": render_to_string(
+                self.fragment_template_name,
+                {self.get_context_object_name(rows): rows},
+            ) if rows else "",
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+        }
+
+    def get_context_data(self, **kwargs):
+        cache = fragment_cache()
+        key = self.get_fragment_key()
+        fragment = cache.get(key)
+        if fragment is None:
+            rows, next_cursor, prev_cursor = self.paginate_keyset(self.fragment_rows())
+            fragment = self.render_fragment(rows, next_cursor, prev_cursor)
+            cache.set(key, fragment, settings.FRAGMENT_CACHE_TIMEOUT)
+            kwargs["object_list"] = rows
+        else:
+            # The rows are already rendered; leave the queryset unevaluated.
+            kwargs["object_list"] = self.object_list
+        kwargs.update(fragment)
+        return super().get_context_data(**kwargs)
+
+    async def aget_fragment(self):
+        cache = fragment_cache()
+        key = self.fragment_key(await aget_generations(*self.fragment_models))
+        fragment = await cache.aget(key)
+        if fragment is not None:
+            return fragment, []
+        rows, next_cursor, prev_cursor = await self.apaginate_keyset(self.fragment_rows())
+        fragment = self.render_fragment(rows, next_cursor, prev_cursor)
+        await cache.aset(key, fragment, settings.FRAGMENT_CACHE_TIMEOUT)
+        return fragment, rows
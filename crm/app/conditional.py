@@ -0,0 +1,85 @@
+import hashlib
+from functools import partial
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(":".join(map(str, parts)).encode()).hexdigest())
+
+
+def conditional_response(request, etag, last_modified):
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp), timestamp
+
+
+def set_validators(response, etag, timestamp):
+    response.headers["ETag"] = etag
+    if timestamp is not None:
+        response.headers["Last-Modified"] = http_date(timestamp)
+    # Pages are per-user behind a login: browsers may keep them but must revalidate.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_get(request, validators, get):
+    etag, last_modified = validators
+    if etag is None:
+        return get()
+
+    response, timestamp = conditional_response(request, etag, last_modified)
+    if response is None:
+        response = get()
+    return set_validators(response, etag, timestamp)
+
+
+class ConditionalDetailMixin:
+    last_modified_fields = ("updated_at",)
+
+    def validators_queryset(self):
+        pk = self.kwargs[self.pk_url_kwarg]
+        return self.get_queryset().filter(pk=pk).values_list(*self.last_modified_fields)
+
+    def row_validators(self, row):
+        if row is None:
+            return None, None
+        last_modified = max(value for value in row if value is not None)
+        return make_etag(self.__class__.__name__, self.kwargs[self.pk_url_kwarg], *row), last_modified
+
+    def get_validators(self):
+        return self.row_validators(self.validators_queryset().first())
+
+    async def aget_validators(self):
+        return self.row_validators(await self.validators_queryset().afirst())
+
+    def get(self, request, *args, **kwargs):
+        return conditional_get(request, self.get_validators(), partial(super().get, request, *args, **kwargs))
+
+
+class ConditionalListMixin:
+    def validators_state(self):
+        return {"last_modified": Max("updated_at"), "count": Count("pk")}
+
+    def state_validators(self, state):
+        etag = make_etag(
+            self.__class__.__name__,
+            self.request.GET.get(self.cursor_param, ""),
+            self.get_page_size(),
+            state["count"],
+            state["last_modified"],
+            # List pages carry CSRF tokens; a rotated cookie (e.g. after login) needs a fresh page.
+            self.request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+        )
+        return etag, state["last_modified"]
+
+    def get_validators(self):
+        return self.state_validators(self.get_queryset().aggregate(**self.validators_state()))
+
+    async def aget_validators(self):
+        return self.state_validators(await self.get_queryset().aaggregate(**self.validators_state()))
+
+    def get(self, request, *args, **kwargs):
+        return conditional_get(request, self.get_validators(), partial(super().get, request, *args, **kwargs))
@@ -0,0 +1,83 @@
+import mimetypes
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import content_disposition_header
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header, size):
+    # Only a single range is supported; anything else gets the whole file,
+    # which RFC 9110 allows. Returns None for that, False if unsatisfiable.
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+class RangeFile:
+    # Reads at most length bytes from the current position. It has no
+    # fileno(), so WSGI servers will not sendfile() past the range.
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b""
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def document_response(request, document, filename):
+    # Content-addressed names make the file name a strong validator.
+    etag = '"%s"' % posixpath.splitext(posixpath.basename(document.name))[0]
+
+    if settings.DOCUMENT_ACCEL_REDIRECT:
+        # nginx serves the file, Range requests included.
+        response = HttpResponse(content_type=mimetypes.guess_type(filename)[0] or "application/octet-stream")
+        response.headers["X-Accel-Redirect"] = settings.DOCUMENT_ACCEL_REDIRECT + quote(document.name)
+        response.headers["Content-Disposition"] = content_disposition_header(True, filename)
+        response.headers["ETag"] = etag
+        return response
+
+    size = document.size
+    byte_range = None
+    if "HTTP_RANGE" in request.META and request.META.get("HTTP_IF_RANGE", etag) == etag:
+        byte_range = parse_range(request.META["HTTP_RANGE"], size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response.headers["Content-Range"] = f"bytes */{size}"
+        return response
+
+    file = document.storage.open(document.name, "rb")
+    if byte_range is None:
+        # FileResponse lets the WSGI server use sendfile() for the whole file.
+        response = FileResponse(file, as_attachment=True, filename=filename)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(RangeFile(file, end - start + 1), status=206, as_attachment=True, filename=filename)
+        response.headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response.headers["Content-Length"] = end - start + 1
+    response.headers["Accept-Ranges"] = "bytes"
+    response.headers["ETag"] = etag
+    return response
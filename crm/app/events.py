@@ -0,0 +1,91 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ClientEvent
+
+# Events recorded while a request is handled are buffered here and written
+# with one bulk_create when it finishes. Outside a request (commands, shell)
+# there is no buffer and every event is written straight away.
+_buffer = ContextVar("client_event_buffer", default=None)
+_actor = ContextVar("client_event_actor", default=None)
+
+EVENT_FIELDS = ("name", "surname", "middle_name", "phone_num", "email", "advert_id", "active", "contract_id")
+
+
+def flush(events):
+    if events:
+        ClientEvent.objects.bulk_create(events)
+
+
+def add(events):
+    buffer = _buffer.get()
+    if buffer is None:
+        flush(events)
+    else:
+        buffer.extend(events)
+
+
+def record(events, buffered=True):
+    # Events of rolled back writes are dropped: they only reach the buffer
+    # once the surrounding transaction commits (immediately in autocommit).
+    # Batched writers pass buffered=False so each batch's events are written
+    # on its commit instead of piling up in the request buffer.
+    events = list(events)
+    if events:
+        transaction.on_commit(lambda: (add if buffered else flush)(events))
+
+
+def event(client_id, kind, changes=None):
+    return ClientEvent(
+        client_id=client_id,
+        kind=kind,
+        changes=changes or {},
+        # request.user is lazy; it is only loaded when something is recorded.
+        actor_id=getattr(_actor.get(), "pk", None),
+        created_at=timezone.now(),
+    )
+
+
+@contextmanager
+def event_buffer(actor=None):
+    buffer = []
+    buffer_token = _buffer.set(buffer)
+    actor_token = _actor.set(actor)
+    try:
+        yield buffer
+    finally:
+        _buffer.reset(buffer_token)
+        _actor.reset(actor_token)
+
+
+@contextmanager
+def buffered_events(actor=None):
+    with event_buffer(actor) as buffer:
+        try:
+            yield buffer
+        finally:
+            flush(buffer)
+
+
+def client_fields(instance):
+    return {field: getattr(instance, field) for field in EVENT_FIELDS if field in instance.__dict__}
+
+
+def change_events(client_id, before, after):
+    changes = {
+        field: [before[field], value]
+        for field, value in after.items()
+        if field in before and before[field] != value
+    }
+    events = []
+    if changes.get("active") == [False, True]:
+        del changes["active"]
+        events.append(event(client_id, ClientEvent.PROMOTED))
+    if changes.get("contract_id", [None, None])[1] is not None:
+        events.append(event(client_id, ClientEvent.CONTRACT_ATTACHED, {"contract_id": changes.pop("contract_id")}))
+    if changes:
+        events.insert(0, event(client_id, ClientEvent.UPDATED, changes))
+    return events
@@ -0,0 +1,73 @@
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import bump_generation
+from .models import Client, Contract, ExpiryScan
+
+
+def expiry_horizon(now, days=None):
+    return now + timedelta(days=settings.CONTRACT_EXPIRY_DAYS if days is None else days)
+
+
+def expiring_contracts(now=None, days=None):
+    # A range scan on the expires_at index.
+    now = now or timezone.now()
+    return Contract.objects.filter(expires_at__gte=now, expires_at__lt=expiry_horizon(now, days))
+
+
+SCAN_PK = 1
+
+
+def chunked_ids(queryset, chunk_size):
+    ids = queryset.values_list("pk", flat=True).iterator(chunk_size=chunk_size)
+    while chunk := list(islice(ids, chunk_size)):
+        yield chunk
+
+
+def mark_clients(contract_ids, now):
+    return (
+        Client.objects
+        .filter(contract_id__in=contract_ids, contract_expiring=False)
+        .touch(now, contract_expiring=True)
+    )
+
+
+def clear_clients(clients, now):
+    return clients.filter(contract_expiring=True).touch(now, contract_expiring=False)
+
+
+def mark_expiring_clients(now=None, days=None, chunk_size=1000, full=False):
+    # Flags the clients of contracts that run out before the horizon, expired
+    # ones included. After the first run only two index range scans are read:
+    # contracts whose expires_at entered the window since the last run, and
+    # contracts edited since then, whose expiry may have moved either way.
+    # full=True rescans everything, e.g. after CONTRACT_EXPIRY_DAYS changed.
+    started_at = timezone.now()
+    now = now or started_at
+    horizon = expiry_horizon(now, days)
+    scan, _ = ExpiryScan.objects.get_or_create(pk=SCAN_PK)
+    incremental = not full and scan.horizon is not None
+
+    crossed = Contract.objects.filter(expires_at__lt=horizon).order_by("expires_at")
+    if incremental:
+        crossed = crossed.filter(expires_at__gte=scan.horizon)
+    marked = sum(mark_clients(chunk, now) for chunk in chunked_ids(crossed, chunk_size))
+
+    if incremental:
+        cleared = 0
+        moved = Contract.objects.filter(updated_at__gte=scan.started_at).order_by("updated_at")
+        for chunk in chunked_ids(moved, chunk_size):
+            expiring = list(Contract.objects.filter(pk__in=chunk, expires_at__lt=horizon).values_list("pk", flat=True))
+            marked += mark_clients(expiring, now)
+            cleared += clear_clients(Client.objects.filter(contract_id__in=chunk).exclude(contract_id__in=expiring), now)
+    else:
+        cleared = clear_clients(Client.objects.exclude(contract__expires_at__lt=horizon), now)
+
+    scan.horizon, scan.started_at = horizon, started_at
+    scan.save()
+    if marked or cleared:
+        bump_generation(Client)
+    return marked, cleared
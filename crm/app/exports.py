@@ -0,0 +1,119 @@
+import csv
+import io
+import tempfile
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json",
+}
+
+
+def iter_values(queryset, fields):
+    # iterator() keeps a server-side cursor open on PostgreSQL and fetches
+    # chunk_size rows at a time, so the export never holds the whole table.
+    return queryset.values_list(*fields).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+def buffered(lines):
+    # One WSGI write per row is slower than the rows themselves; send ~64KB blocks.
+    buffer = io.StringIO()
+    for line in lines:
+        buffer.write(line)
+        if buffer.tell() >= settings.EXPORT_BUFFER_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def csv_lines(rows, fields):
+    line = io.StringIO()
+    writer = csv.writer(line)
+    writer.writerow(fields)
+    yield line.getvalue()
+    for row in rows:
+        line.seek(0)
+        line.truncate()
+        writer.writerow(row)
+        yield line.getvalue()
+
+
+def json_lines(rows, fields):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    yield "["
+    separator = "\n"
+    for row in rows:
+        yield separator + encoder.encode(dict(zip(fields, row)))
+        separator = ",\n"
+    yield "\n]\n"
+
+
+def copy_blocks(queryset, fields):
+    connection = connections[queryset.db]
+    sql, params = queryset.values_list(*fields).query.sql_with_params()
+    copy_sql = f"COPY ({connection.ops.compose_sql(sql, params)}) TO STDOUT WITH (FORMAT csv)"
+    header = io.StringIO()
+    csv.writer(header).writerow(fields)
+    yield header.getvalue().encode()
+
+    with connection.cursor() as cursor:
+        if hasattr(cursor.cursor, "copy"):
+            # psycopg 3 streams COPY output block by block.
+            with cursor.cursor.copy(copy_sql) as copy:
+                for block in copy:
+                    yield bytes(block)
+        else:
+            # psycopg2 can only copy into a file; spool it to disk past the buffer size.
+            with tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_BUFFER_SIZE) as spool:
+                cursor.cursor.copy_expert(copy_sql, spool)
+                spool.seek(0)
+                while block := spool.read(settings.EXPORT_BUFFER_SIZE):
+                    yield block
+
+
+def use_copy(queryset, export_format):
+    return (
+        export_format == "csv"
+        and settings.EXPORT_USE_COPY
+        and connections[queryset.db].vendor == "postgresql"
+    )
+
+
+def export_stream(queryset, fields, export_format):
+    if use_copy(queryset, export_format):
+        return copy_blocks(queryset, fields)
+    lines = csv_lines if export_format == "csv" else json_lines
+    return buffered(lines(iter_values(queryset, fields), fields))
+
+
+def export_filename(name, export_format):
+    return f"{name}-{timezone.localdate():%Y-%m-%d}.{export_format}"
+
+
+class ExportMixin:
+    export_name = None
+    export_fields = ()
+    list_view = None
+
+    def get_queryset(self):
+        # Same rows and order as the list page the export belongs to.
+        return self.list_view.queryset.order_by(*self.list_view.keyset_fields)
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get("format", "csv")
+        if export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest(f"Unknown export format {export_format!r}")
+        response = StreamingHttpResponse(
+            export_stream(self.get_queryset(), self.export_fields, export_format),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        filename = export_filename(self.export_name, export_format)
+        response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
@@ -0,0 +1,58 @@
+from decimal import Decimal
+from functools import lru_cache
+from random import choices
+from string import ascii_letters
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+
+from .models import Advert, Client, Contract, Service, contract_expiry
+
+# Test data builders. Every make_* call inserts its objects with a single
+# bulk_create, which skips Model.save() and the post_save signals: tests of
+# the statistics, client history or cache invalidation create their objects
+# through the ORM as usual.
+
+
+def random_text(length=10):
+    return "".join(choices(ascii_letters, k=length))
+
+
+@lru_cache
+def hashed_password(password):
+    # Hashing is slow by design, and every test user shares the password.
+    return make_password(password)
+
+
+def make_user(username="test", password="test", **fields):
+    return User.objects.create(username=username, password=hashed_password(password), **fields)
+
+
+def make_superuser(username="test", password="test", **fields):
+    return make_user(username, password, is_superuser=True, **fields)
+
+
+def build(model, count, defaults, fields):
+    return [model(**{**{name: value() for name, value in defaults.items()}, **fields}) for _ in range(count)]
+
+
+def make_adverts(count=1, **fields):
+    defaults = {"name": random_text, "description": random_text, "channel": random_text}
+    return Advert.objects.bulk_create(build(Advert, count, defaults, fields))
+
+
+def make_contracts(count=1, **fields):
+    contracts = build(Contract, count, {"name": random_text, "description": random_text}, fields)
+    for contract in contracts:
+        contract.expires_at = contract_expiry(contract.created_at, contract.validity_period)
+    return Contract.objects.bulk_create(contracts)
+
+
+def make_services(count=1, **fields):
+    defaults = {"name": random_text, "description": random_text, "price": lambda: Decimal("10.00")}
+    return Service.objects.bulk_create(build(Service, count, defaults, fields))
+
+
+def make_clients(count=1, **fields):
+    defaults = {"name": random_text, "surname": random_text, "phone_num": random_text, "email": random_text}
+    return Client.objects.bulk_create(build(Client, count, defaults, fields))
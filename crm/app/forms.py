@@ -0,0 +1,41 @@
+from django import forms
+
+from .models import Advert, Client
+
+
+class ClientImportForm(forms.Form):
+    file = forms.FileField(label="Файл CSV или XLSX")
+    active = forms.BooleanField(label="Импортировать как активных клиентов", required=False)
+
+
+class IdListField(forms.Field):
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return [int(pk) for pk in value or ()]
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Некорректный идентификатор клиента")
+
+
+class ClientPromoteForm(forms.Form):
+    ids = IdListField(required=False)
+    advert = forms.ModelChoiceField(
+        queryset=Advert.objects.order_by("name"),
+        required=False,
+        label="Все потенциальные клиенты кампании",
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get("ids") and not cleaned_data.get("advert"):
+            raise forms.ValidationError("Выберите клиентов или рекламную кампанию")
+        return cleaned_data
+
+    def get_queryset(self):
+        queryset = Client.objects.filter(active=False)
+        if self.cleaned_data["ids"]:
+            queryset = queryset.filter(pk__in=self.cleaned_data["ids"])
+        if self.cleaned_data["advert"]:
+            queryset = queryset.filter(advert=self.cleaned_data["advert"])
+        return queryset
@@ -0,0 +1,136 @@
+import csv
+import io
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import events, statistics
+from .cache import bump_generation
+from .models import Advert, Client, ClientEvent
+
+IMPORT_FIELDS = ("name", "surname", "middle_name", "phone_num", "email", "advert")
+ERROR_FIELDS = ("line",) + IMPORT_FIELDS + ("errors",)
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+
+
+def iter_csv_rows(stream):
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def iter_xlsx_rows(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("XLSX import requires the openpyxl package")
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell or "").strip() for cell in next(rows, ())]
+        for line, values in enumerate(rows, start=2):
+            yield line, {
+                key: "" if value is None else str(value)
+                for key, value in zip(header, values)
+            }
+    finally:
+        workbook.close()
+
+
+def iter_rows(stream, filename):
+    if filename.lower().endswith(".xlsx"):
+        return iter_xlsx_rows(stream)
+    return iter_csv_rows(stream)
+
+
+def advert_lookup():
+    adverts = list(Advert.objects.values_list("pk", "name", "channel").order_by("-pk"))
+    # Channels first so that an advert name wins over an equal channel, and
+    # newer adverts first so the oldest one wins among equal names.
+    lookup = {channel.strip().lower(): pk for pk, name, channel in adverts}
+    lookup.update((name.strip().lower(), pk) for pk, name, channel in adverts)
+    return lookup
+
+
+def build_client(row, adverts, active):
+    values = {}
+    errors = []
+    for name in IMPORT_FIELDS[:-1]:
+        field = Client._meta.get_field(name)
+        value = (row.get(name) or "").strip()
+        if not value and field.null:
+            value = None
+        try:
+            values[name] = field.clean(value, None)
+        except ValidationError as error:
+            errors.append(f"{name}: {' '.join(error.messages)}")
+
+    advert = (row.get("advert") or "").strip()
+    if advert:
+        values["advert_id"] = adverts.get(advert.lower())
+        if values["advert_id"] is None:
+            errors.append(f"advert: unknown advert {advert!r}")
+
+    if errors:
+        return None, errors
+    return Client(active=active, **values), None
+
+
+def write_batch(batch):
+    with transaction.atomic():
+        Client.objects.bulk_create(batch)
+        statistics.clients_created(batch)
+        events.record(
+            (events.event(client.pk, ClientEvent.CREATED, events.client_fields(client)) for client in batch),
+            buffered=False,
+        )
+    bump_generation(Client)
+
+
+def import_clients(rows, batch_size=1000, active=False, error_writer=None):
+    result = ImportResult()
+    adverts = advert_lookup()
+
+    def valid_clients():
+        for line, row in rows:
+            client, errors = build_client(row, adverts, active)
+            if client is not None:
+                yield client
+                continue
+            result.rejected += 1
+            if error_writer is not None:
+                error_writer.writerow(dict(
+                    {field: row.get(field, "") for field in IMPORT_FIELDS},
+                    line=line,
+                    errors="; ".join(errors),
+                ))
+
+    clients = valid_clients()
+    while batch := list(islice(clients, batch_size)):
+        write_batch(batch)
+        result.imported += len(batch)
+    return result
+
+
+def error_writer(stream):
+    writer = csv.DictWriter(stream, fieldnames=ERROR_FIELDS)
+    writer.writeheader()
+    return writer
+
+
+class ErrorPreview:
+    def __init__(self, limit):
+        self.limit = limit
+        self.rows = []
+
+    def writerow(self, row):
+        if len(self.rows) < self.limit:
+            self.rows.append(row)
@@ -0,0 +1,49 @@
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from app.async_views import ASYNC_VARIANTS
+from app.benchmarks import asgi_load, benchmark_user, format_load, route_path, test_host, wsgi_load
+from app.urls import urlpatterns
+
+DEFAULT_ROUTES = "active_list,potential_list,adverts_list,statistics,active_details"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput of the sync views through the WSGI handler with the "
+        "async views through the ASGI handler, in process and under concurrency"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--routes", default=DEFAULT_ROUTES, help="Comma separated route names")
+        parser.add_argument("--requests", type=int, default=200, help="Requests per route and mode")
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument("--username", default=None, help="User to log in as (default: first superuser)")
+
+    def route_paths(self, names):
+        patterns = {pattern.name: pattern for pattern in urlpatterns}
+        paths = {}
+        for name in names:
+            pattern = patterns.get(name)
+            if pattern is None or pattern.callback.view_class not in ASYNC_VARIANTS:
+                raise CommandError(f"{name} has no async variant")
+            paths[name] = route_path(pattern)
+        return paths
+
+    def report(self, name, mode, elapsed, timings):
+        self.stdout.write(f"{name:<20} {mode:<5} {format_load(elapsed, timings)}")
+
+    def handle(self, *args, **options):
+        user = benchmark_user(options["username"])
+        paths = self.route_paths(name.strip() for name in options["routes"].split(",") if name.strip())
+        requests, concurrency = options["requests"], options["concurrency"]
+
+        with test_host():
+            for name, path in paths.items():
+                # One request first, so lazily built state (the statistics
+                # snapshot, cache generations) is not created under concurrency.
+                wsgi_load(user, path, 1, 1)
+                self.report(name, "wsgi", *wsgi_load(user, path, requests, concurrency))
+                with override_settings(ROOT_URLCONF="crm.async_urls"):
+                    self.report(name, "asgi", *async_to_sync(asgi_load)(user, path, requests, concurrency))
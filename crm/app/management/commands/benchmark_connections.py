@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from app.benchmarks import benchmark_user, format_load, route_path, test_host, wsgi_load
+from app.urls import urlpatterns
+
+
+class ConnectionCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, sender, connection, **kwargs):
+        if connection.alias == "default":
+            self.count += 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-request latency under concurrent load with a new database "
+        "connection per request and with the configured connection settings"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--route", default="active_list")
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument("--username", default=None, help="User to log in as (default: first superuser)")
+
+    def run(self, label, user, path, requests, concurrency):
+        counter = ConnectionCounter()
+        connection_created.connect(counter)
+        try:
+            elapsed, timings = wsgi_load(user, path, requests, concurrency)
+        finally:
+            connection_created.disconnect(counter)
+        self.stdout.write(f"{label:<26} {format_load(elapsed, timings)}  {counter.count} connections opened")
+
+    def handle(self, *args, **options):
+        patterns = {pattern.name: pattern for pattern in urlpatterns}
+        if options["route"] not in patterns:
+            raise CommandError(f"Unknown route {options['route']}")
+        user = benchmark_user(options["username"])
+        path = route_path(patterns[options["route"]])
+        requests, concurrency = options["requests"], options["concurrency"]
+
+        # Every thread's DatabaseWrapper reads this dict, so the baseline can
+        # be switched to connect-per-request without restarting.
+        database = connections.settings["default"]
+        configured = database["CONN_MAX_AGE"], database["CONN_HEALTH_CHECKS"]
+
+        with test_host():
+            wsgi_load(user, path, 1, 1)
+            connections.close_all()
+            database["CONN_MAX_AGE"], database["CONN_HEALTH_CHECKS"] = 0, False
+            try:
+                self.run("CONN_MAX_AGE=0", user, path, requests, concurrency)
+            finally:
+                database["CONN_MAX_AGE"], database["CONN_HEALTH_CHECKS"] = configured
+            self.run(f"CONN_MAX_AGE={configured[0]}", user, path, requests, concurrency)
@@ -0,0 +1,142 @@
+import json
+import platform
+import subprocess
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from app.benchmarks import (
+    benchmark_user,
+    client_load,
+    http_load,
+    latency_summary,
+    peak_rss_kb,
+    route_path,
+    session_cookie,
+    test_host,
+)
+from app.models import Advert, Client, Contract, Service
+from app.seed import SCALES, seed_dataset
+from app.urls import urlpatterns
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every route in app/urls.py: latency percentiles, queries per request "
+        "and peak RSS through the test client, optionally also over HTTP against a running "
+        "server, with the results written as JSON for comparison between commits"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=sorted(SCALES), help="Seed a synthetic dataset of this size first")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for --scale")
+        parser.add_argument("--routes", default="", help="Comma separated route names (default: all)")
+        parser.add_argument("--exclude", default="", help="Comma separated route names to skip")
+        parser.add_argument("--requests", type=int, default=50, help="Measured requests per route")
+        parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests per route")
+        parser.add_argument("--url", help="Base URL of a running server, e.g. http://127.0.0.1:8000/app")
+        parser.add_argument("--concurrency", type=int, default=10, help="Threads for --url")
+        parser.add_argument("--username", default=None, help="User to log in as (default: first superuser)")
+        parser.add_argument("--output", help="Write the results to this JSON file")
+        parser.add_argument("--compare", help="JSON file of an earlier run to compare with")
+
+    def select_patterns(self, routes, exclude):
+        patterns = {pattern.name: pattern for pattern in urlpatterns}
+        names = [name.strip() for name in routes.split(",") if name.strip()] or list(patterns)
+        unknown = [name for name in names if name not in patterns]
+        if unknown:
+            raise CommandError(f"Unknown routes: {', '.join(unknown)}")
+        skipped = {name.strip() for name in exclude.split(",")}
+        return [patterns[name] for name in names if name not in skipped]
+
+    def measure(self, pattern, user, options, cookie):
+        path = route_path(pattern)
+        result = {"route": pattern.name, "path": path}
+        rss_before = peak_rss_kb()
+        client_load(user, path, options["warmup"])
+        timings, queries = client_load(user, path, options["requests"])
+        result.update(latency_summary(timings))
+        result.update(
+            queries_mean=round(sum(queries) / len(queries), 2),
+            queries_max=max(queries),
+            query_budget=getattr(pattern.callback.view_class, "query_budget", None),
+            peak_rss_kb=peak_rss_kb(),
+        )
+        if rss_before is not None:
+            result["rss_growth_kb"] = result["peak_rss_kb"] - rss_before
+        if options["url"]:
+            elapsed, timings = http_load(options["url"], cookie, path, options["requests"], options["concurrency"])
+            result["http"] = dict(latency_summary(timings), requests_per_second=round(len(timings) / elapsed, 1))
+        return result
+
+    def report(self, result, baseline):
+        if "error" in result:
+            self.stdout.write(self.style.ERROR(f"{result['route']:<22} {result['error']}"))
+            return
+        line = (
+            f"{result['route']:<22} p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}  "
+            f"p99 {result['p99_ms']:>8.2f} ms  queries {result['queries_max']:>3}"
+        )
+        if "http" in result:
+            line += f"  http p95 {result['http']['p95_ms']:>8.2f} ms {result['http']['requests_per_second']:>7.1f} req/s"
+        previous = baseline.get(result["route"])
+        if previous and previous.get("p95_ms"):
+            line += f"  p95 x{result['p95_ms'] / previous['p95_ms']:.2f} vs baseline"
+        budget = result["query_budget"]
+        self.stdout.write(self.style.WARNING(line) if budget is not None and result["queries_max"] > budget else line)
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1:
+            raise CommandError("--requests must be at least 1")
+        baseline = {}
+        if options["compare"]:
+            with open(options["compare"]) as file:
+                baseline = {result["route"]: result for result in json.load(file)["routes"]}
+
+        if options["scale"]:
+            start = time.perf_counter()
+            seed_dataset(seed=options["seed"], **SCALES[options["scale"]])
+            self.stdout.write(f"Seeded the {options['scale']} dataset in {time.perf_counter() - start:.1f} s")
+
+        user = benchmark_user(options["username"])
+        cookie = session_cookie(user) if options["url"] else None
+        results = []
+        with test_host():
+            for pattern in self.select_patterns(options["routes"], options["exclude"]):
+                try:
+                    result = self.measure(pattern, user, options, cookie)
+                except CommandError as error:
+                    result = {"route": pattern.name, "error": str(error)}
+                results.append(result)
+                self.report(result, baseline)
+
+        if options["output"]:
+            report = {
+                "commit": git_commit(),
+                "created_at": timezone.now().isoformat(),
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "rows": {model.__name__: model.objects.count() for model in (Advert, Client, Contract, Service)},
+                "requests": options["requests"],
+                "concurrency": options["concurrency"] if options["url"] else None,
+                "routes": results,
+            }
+            with open(options["output"], "w") as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
@@ -0,0 +1,62 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
+
+from app.metrics import percentile
+from app.models import Client
+from app.search import search_clients
+
+
+class Command(BaseCommand):
+    help = "Time client search for typeahead-style terms sampled from existing clients"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--terms", type=int, default=200, help="Number of distinct search terms")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per term")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--target-ms", type=float, default=10.0, help="Fail if p95 latency exceeds this")
+
+    def sample_terms(self, count, rng):
+        bounds = Client.objects.aggregate(low=Min("pk"), high=Max("pk"))
+        if bounds["low"] is None:
+            raise CommandError("There are no clients to search; seed the database first")
+        # Random primary keys instead of ORDER BY random(), which sorts the whole table.
+        pks = [rng.randint(bounds["low"], bounds["high"]) for _ in range(count)]
+        clients = Client.objects.filter(pk__in=pks).values_list("surname", "name", "email", "phone_digits")
+
+        terms = []
+        for surname, name, email, phone_digits in clients:
+            terms += [
+                surname[:3],
+                f"{surname[:4]} {name[:2]}",
+                email.split("@")[0][:5],
+                phone_digits[-4:],
+            ]
+        rng.shuffle(terms)
+        return [term for term in terms if len(term.strip()) >= 2][:count]
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        terms = self.sample_terms(options["terms"], rng)
+
+        timings = []
+        found = 0
+        for term in terms:
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                results = list(search_clients(term))
+                timings.append((time.perf_counter() - start) * 1000)
+            found += bool(results)
+
+        p50, p95, p99 = (percentile(timings, fraction) for fraction in (0.5, 0.95, 0.99))
+        self.stdout.write(
+            f"{connection.vendor}: {Client.objects.count()} clients, {len(terms)} terms x {options['repeat']} runs, "
+            f"{found} terms with results"
+        )
+        self.stdout.write(f"p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms")
+        if p95 > options["target_ms"]:
+            raise CommandError(f"p95 {p95:.2f} ms is above the {options['target_ms']} ms target")
+        self.stdout.write(self.style.SUCCESS(f"p95 is within the {options['target_ms']} ms target"))
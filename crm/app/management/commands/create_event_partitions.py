@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+TABLE = "app_clientevent"
+DEFAULT_PARTITION = "app_clientevent_default"
+
+
+def month_starts(first, count):
+    month = first.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    for _ in range(count):
+        yield month
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the monthly partitions of the client history table on PostgreSQL, "
+        "from the current month on. Run it monthly, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", type=int, default=3, help="Months to create, the current one included")
+
+    def create_partition(self, cursor, name, start, end):
+        bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        in_range = "created_at >= %s AND created_at < %s"
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range})", [start, end])
+        if not cursor.fetchone()[0]:
+            cursor.execute(f"CREATE TABLE {name} PARTITION OF {TABLE} {bounds}")
+            return 0
+        # Rows of that month already went to the default partition, which
+        # would then overlap the new one: move them over first.
+        cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {DEFAULT_PARTITION}")
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF {TABLE} {bounds}")
+        cursor.execute(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_range}", [start, end])
+        moved = cursor.rowcount
+        cursor.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}", [start, end])
+        cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+        return moved
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            self.stdout.write(f"{connection.vendor} does not partition the client history, nothing to do")
+            return
+
+        months = list(month_starts(datetime.now(timezone.utc), options["months"] + 1))
+        for start, end in zip(months, months[1:]):
+            name = f"{TABLE}_{start:%Y_%m}"
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("SELECT to_regclass(%s)", [name])
+                if cursor.fetchone()[0] is not None:
+                    continue
+                moved = self.create_partition(cursor, name, start, end)
+            self.stdout.write(f"Created {name}" + (f", moved {moved} events from the default partition" if moved else ""))
@@ -0,0 +1,92 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.db.models import QuerySet
+from django.test import RequestFactory
+from django.utils import timezone
+from django.views.generic import DetailView, ListView
+
+from app.pagination import encode_cursor
+from app.urls import urlpatterns
+
+SEQ_SCAN_PATTERNS = {
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+    "sqlite": re.compile(r"\bSCAN (\w+)\s*$"),
+}
+
+
+def placeholder(model, name):
+    field = model._meta.pk if name == "pk" else model._meta.get_field(name)
+    if isinstance(field, models.DateTimeField):
+        return timezone.now()
+    if isinstance(field, (models.IntegerField, models.AutoField)):
+        return 0
+    return ""
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN on the querysets of list and detail views and report sequential scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pk", type=int, default=1, help="Primary key used for detail view lookups")
+
+    def view_querysets(self, pk):
+        factory = RequestFactory()
+        for pattern in urlpatterns:
+            view_class = getattr(pattern.callback, "view_class", None)
+            if view_class is None or not issubclass(view_class, (ListView, DetailView)):
+                continue
+            # Views without a model or queryset build their data in
+            # get_queryset(), which may write (StatisticsView rebuilds a
+            # missing snapshot), so it is not called for them.
+            if view_class.model is None and view_class.queryset is None:
+                continue
+            kwargs = {"pk": pk} if "pk" in pattern.pattern.converters else {}
+            view = view_class()
+            view.setup(factory.get("/"), **kwargs)
+            queryset = view.get_queryset()
+            if not isinstance(queryset, QuerySet):
+                continue
+
+            if issubclass(view_class, DetailView):
+                yield pattern.name, queryset.filter(pk=pk)
+            else:
+                # Every page after the first is a keyset range query.
+                values = [placeholder(queryset.model, field) for field in view.keyset_fields]
+                view.setup(factory.get("/", {view.cursor_param: encode_cursor("next", values)}), **kwargs)
+                page, _, _ = view.keyset_page(queryset)
+                yield pattern.name, page
+
+    def explain(self, queryset):
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                # Small tables are always cheaper to scan sequentially; with
+                # seqscan disabled a Seq Scan only remains when no index fits.
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            return queryset.explain()
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"EXPLAIN parsing is not supported for {connection.vendor}")
+
+        offenders = []
+        # Nothing this command runs is meant to write; should a view still do
+        # so, it is rolled back.
+        with transaction.atomic():
+            for name, queryset in self.view_querysets(options["pk"]):
+                plan = self.explain(queryset)
+                tables = [match.group(1) for match in map(pattern.search, plan.splitlines()) if match]
+                if tables:
+                    offenders.append(name)
+                    self.stdout.write(self.style.ERROR(f"{name}: sequential scan on {', '.join(tables)}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"{name}: ok"))
+                if options["verbosity"] > 1:
+                    self.stdout.write(plan)
+            transaction.set_rollback(True)
+
+        if offenders:
+            raise CommandError(f"Sequential scans found in: {', '.join(offenders)}")
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.imports import error_writer, import_clients, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Import clients from a CSV or XLSX file in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or XLSX file with a header row")
+        parser.add_argument("--batch-size", type=int, default=settings.IMPORT_BATCH_SIZE)
+        parser.add_argument("--errors", default=None, help="Where to write rejected rows (default: <path>.errors.csv)")
+        parser.add_argument("--active", action="store_true", help="Import as active clients")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        errors_path = options["errors"] or f"{path}.errors.csv"
+        try:
+            with open(path, "rb") as source, open(errors_path, "w", newline="", encoding="utf-8") as errors:
+                result = import_clients(
+                    iter_rows(source, path),
+                    batch_size=options["batch_size"],
+                    active=options["active"],
+                    error_writer=error_writer(errors),
+                )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {result.imported} clients"))
+        if result.rejected:
+            self.stdout.write(self.style.WARNING(f"Rejected {result.rejected} rows, see {errors_path}"))
@@ -0,0 +1,45 @@
+import os
+import shutil
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils._os import safe_join
+
+from app.models import Contract
+from app.storage import document_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the contract documents stored under an old storage root into MEDIA_ROOT. "
+        "Before MEDIA_ROOT defaulted to BASE_DIR/media, documents were stored relative "
+        "to the directory the server was started from."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            default=str(settings.BASE_DIR),
+            help="Old storage root (default: BASE_DIR, where manage.py is run from)",
+        )
+
+    def handle(self, *args, **options):
+        source = os.path.abspath(options["source"])
+        if source == os.path.abspath(document_storage.location):
+            raise CommandError("The source is MEDIA_ROOT itself")
+
+        moved = missing = 0
+        names = Contract.objects.exclude(document="").exclude(document=None).values_list("document", flat=True)
+        for name in names.distinct().iterator():
+            if document_storage.exists(name):
+                continue
+            path = safe_join(source, name)
+            if not os.path.isfile(path):
+                missing += 1
+                self.stderr.write(f"Not found: {path}")
+                continue
+            target = document_storage.path(name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(path, target)
+            moved += 1
+        self.stdout.write(self.style.SUCCESS(f"Documents moved to {document_storage.location}: {moved}, not found: {missing}"))
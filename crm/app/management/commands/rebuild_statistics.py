@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app.statistics import rebuild_statistics
+
+
+class Command(BaseCommand):
+    help = "Recompute the statistics snapshot from scratch"
+
+    def handle(self, *args, **options):
+        snapshot = rebuild_statistics()
+        self.stdout.write(self.style.SUCCESS(
+            f"Statistics rebuilt: {snapshot.active_clients} active clients, "
+            f"budget {snapshot.advert_budget}, revenue {snapshot.contract_revenue}"
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app.statistics import recount_adverts
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the clients and active clients of every advert and fix the stored "
+        "counters that drifted, e.g. after writes made with raw SQL"
+    )
+
+    def handle(self, *args, **options):
+        fixed = recount_adverts()
+        self.stdout.write(self.style.SUCCESS(f"Advert counters recounted, {fixed} fixed"))
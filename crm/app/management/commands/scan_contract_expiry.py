@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.expiry import mark_expiring_clients
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark the clients whose contract expires within the given number of days "
+        "(or has expired) and unmark renewed ones. Meant to run daily, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Window size (default: CONTRACT_EXPIRY_DAYS)")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Contracts per client UPDATE")
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rescan every contract instead of what changed since the last run, e.g. after changing --days",
+        )
+
+    def handle(self, *args, **options):
+        days = settings.CONTRACT_EXPIRY_DAYS if options["days"] is None else options["days"]
+        marked, cleared = mark_expiring_clients(days=days, chunk_size=options["chunk_size"], full=options["full"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Contracts expiring within {days} days: marked {marked} clients, unmarked {cleared}"
+        ))
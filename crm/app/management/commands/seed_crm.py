@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from app.seed import SCALES, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic adverts, services, contracts and clients "
+        "with Russian names, for profiling. The same --seed generates the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=sorted(SCALES), help="Preset sizes; explicit counts override them")
+        parser.add_argument("--clients", type=int)
+        parser.add_argument("--adverts", type=int)
+        parser.add_argument("--contracts", type=int)
+        parser.add_argument("--services", type=int)
+        parser.add_argument("--active-ratio", type=float, default=0.3, help="Share of active clients")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--chunk-size", type=int, default=10_000, help="Rows per INSERT or COPY")
+        parser.add_argument(
+            "--method",
+            choices=("auto", "insert", "copy"),
+            default="auto",
+            help="Batched INSERTs, COPY (PostgreSQL only) or COPY when available",
+        )
+
+    def handle(self, *args, **options):
+        counts = dict(SCALES[options["scale"]] if options["scale"] else SCALES["10k"])
+        for name in counts:
+            if options[name] is not None:
+                counts[name] = options[name]
+        if not 0 <= options["active_ratio"] <= 1:
+            raise CommandError("--active-ratio must be between 0 and 1")
+        if options["method"] == "copy" and connection.vendor != "postgresql":
+            raise CommandError("COPY is only available on PostgreSQL")
+        use_copy = {"auto": None, "insert": False, "copy": True}[options["method"]]
+
+        start = time.perf_counter()
+        seed_dataset(
+            active_ratio=options["active_ratio"],
+            chunk_size=options["chunk_size"],
+            seed=options["seed"],
+            use_copy=use_copy,
+            **counts,
+        )
+        elapsed = time.perf_counter() - start
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            ", ".join(f"{count} {name}" for name, count in counts.items())
+            + f" created in {elapsed:.1f} s ({total / elapsed:,.0f} rows/s)"
+        ))
@@ -0,0 +1,93 @@
+import math
+import time
+from collections import deque, namedtuple
+from itertools import accumulate
+
+from django.conf import settings
+
+Sample = namedtuple("Sample", "route timestamp queries db_time render_time total_time over_budget")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, math.inf)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, math.inf)
+
+# deque.append and deque.copy run without releasing the GIL, so request
+# threads can record samples while the metrics view reads them, no lock needed.
+_samples = deque(maxlen=settings.METRICS_BUFFER_SIZE)
+
+
+def record(route, queries, db_time, render_time, total_time, over_budget):
+    _samples.append(Sample(route, time.time(), queries, db_time, render_time, total_time, over_budget))
+
+
+def clear():
+    _samples.clear()
+
+
+def format_bound(bound):
+    return "+Inf" if bound == math.inf else repr(bound)
+
+
+def histogram(values, buckets):
+    counts = [0] * len(buckets)
+    for value in values:
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+    bounds = [format_bound(bound) for bound in buckets]
+    return {"buckets": list(zip(bounds, accumulate(counts))), "count": len(values), "sum": sum(values)}
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize():
+    routes = {}
+    for sample in _samples.copy():
+        routes.setdefault(sample.route, []).append(sample)
+
+    summary = {}
+    for route, samples in sorted(routes.items()):
+        total_times = [sample.total_time for sample in samples]
+        summary[route] = {
+            "requests": len(samples),
+            "over_budget": sum(sample.over_budget for sample in samples),
+            "p50": percentile(total_times, 0.5),
+            "p95": percentile(total_times, 0.95),
+            "p99": percentile(total_times, 0.99),
+            "total_time": histogram(total_times, LATENCY_BUCKETS),
+            "db_time": histogram([sample.db_time for sample in samples], LATENCY_BUCKETS),
+            "render_time": histogram([sample.render_time for sample in samples], LATENCY_BUCKETS),
+            "queries": histogram([sample.queries for sample in samples], QUERY_BUCKETS),
+        }
+    return summary
+
+
+PROMETHEUS_METRICS = (
+    ("total_time", "crm_request_duration_seconds", "Total request latency"),
+    ("db_time", "crm_request_db_seconds", "Time spent in database queries"),
+    ("render_time", "crm_request_render_seconds", "Time spent rendering templates"),
+    ("queries", "crm_request_queries", "Database queries per request"),
+)
+
+
+def to_prometheus(summary):
+    window = f"over the last {settings.METRICS_BUFFER_SIZE} sampled requests"
+    lines = []
+    for key, name, description in PROMETHEUS_METRICS:
+        lines.append(f"# HELP {name} {description} {window}.")
+        lines.append(f"# TYPE {name} histogram")
+        for route, data in summary.items():
+            for bound, count in data[key]["buckets"]:
+                lines.append(f'{name}_bucket{{route="{route}",le="{bound}"}} {count}')
+            lines.append(f'{name}_sum{{route="{route}"}} {data[key]["sum"]}')
+            lines.append(f'{name}_count{{route="{route}"}} {data[key]["count"]}')
+    lines.append(f"# HELP crm_request_over_budget Requests exceeding the view query budget {window}.")
+    lines.append("# TYPE crm_request_over_budget gauge")
+    for route, data in summary.items():
+        lines.append(f'crm_request_over_budget{{route="{route}"}} {data["over_budget"]}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,151 @@
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils.deprecation import MiddlewareMixin
+from django.views.generic import DetailView, ListView
+
+from . import metrics
+from .events import buffered_events, event_buffer, flush
+from .routers import set_replica_reads
+
+
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.elapsed += time.perf_counter() - start
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def wrap_connections(self, stack, timer):
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timer))
+
+    def record(self, request, timer, total_time):
+        match = request.resolver_match
+        if match is not None:
+            budget = getattr(getattr(match.func, "view_class", None), "query_budget", None)
+            metrics.record(
+                route=match.view_name,
+                queries=timer.count,
+                db_time=timer.elapsed,
+                render_time=request._metrics_render_time,
+                total_time=total_time,
+                over_budget=budget is not None and timer.count > budget,
+            )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timer = QueryTimer()
+        request._metrics_render_time = 0.0
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            self.wrap_connections(stack, timer)
+            response = self.get_response(request)
+        self.record(request, timer, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        timer = QueryTimer()
+        request._metrics_render_time = 0.0
+        start = time.perf_counter()
+        # Async ORM calls run on the request's thread-sensitive executor, so the
+        # connections to wrap are the ones of that thread.
+        stack = ExitStack()
+        await sync_to_async(self.wrap_connections)(stack, timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self.record(request, timer, time.perf_counter() - start)
+        return response
+
+    def process_template_response(self, request, response):
+        # Called right before the handler renders the response.
+        start = time.perf_counter()
+
+        def rendered(response):
+            request._metrics_render_time = time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class ClientEventMiddleware:
+    # Client history recorded during the request is written in one INSERT at the end.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with buffered_events(getattr(request, "user", None)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        # The context variables are set and reset in this task; only the
+        # INSERT runs in a thread.
+        with event_buffer(getattr(request, "user", None)) as buffer:
+            try:
+                return await self.get_response(request)
+            finally:
+                await sync_to_async(flush)(buffer)
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    replica_views = (ListView, DetailView)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "view_class", None)
+        if (
+            request.method in ("GET", "HEAD")
+            and view_class is not None
+            and issubclass(view_class, self.replica_views)
+            # Read-your-writes: a recent write pins the browser to the primary.
+            and settings.REPLICA_STICKY_COOKIE not in request.COOKIES
+        ):
+            set_replica_reads(True)
+
+    def process_response(self, request, response):
+        # WSGI threads are reused between requests, so always switch back.
+        set_replica_reads(False)
+        if request.method not in ("GET", "HEAD", "OPTIONS", "TRACE"):
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE,
+                "1",
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0002_advert_client"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["surname", "name", "id"],
+                name="client_active_name_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(
+                condition=models.Q(("active", False)),
+                fields=["surname", "name", "id"],
+                name="client_potential_name_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(fields=["email"], name="client_email_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(fields=["phone_num"], name="client_phone_num_idx"),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0003_client_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AdvertStatistics",
+            fields=[
+                (
+                    "advert",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="statistics",
+                        serialize=False,
+                        to="app.advert",
+                    ),
+                ),
+                ("client_count", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="StatisticsSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("active_clients", models.IntegerField(default=0)),
+                (
+                    "advert_budget",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "contract_revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("rebuilt_at", models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
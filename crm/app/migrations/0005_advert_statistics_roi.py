@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+def drop_snapshot(apps, schema_editor):
+    # The new columns start at zero; the snapshot is rebuilt on next read.
+    apps.get_model("app", "StatisticsSnapshot").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0004_statistics_snapshot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="advertstatistics",
+            name="converted_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="advertstatistics",
+            name="revenue",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.RunPython(drop_snapshot, migrations.RunPython.noop),
+    ]
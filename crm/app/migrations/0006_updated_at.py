@@ -0,0 +1,52 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:29
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0005_advert_statistics_roi"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="advert",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="client",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="contract",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="service",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(
+                fields=["active", "updated_at"], name="client_active_updated_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:35
+
+import django.db.models.functions.text
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+
+def search_indexes():
+    # PostgreSQL only; the expressions must match the ones in app/search.py.
+    return [
+        GinIndex(
+            SearchVector("surname", "name", "middle_name", "email", config="simple"),
+            name="client_search_vector_idx",
+        ),
+        GinIndex(fields=["surname"], opclasses=["gin_trgm_ops"], name="client_surname_trgm_idx"),
+        GinIndex(fields=["phone_digits"], opclasses=["gin_trgm_ops"], name="client_phone_digits_trgm_idx"),
+    ]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Client = apps.get_model("app", "Client")
+    for index in search_indexes():
+        schema_editor.add_index(Client, index)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Client = apps.get_model("app", "Client")
+    for index in search_indexes():
+        schema_editor.remove_index(Client, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0006_updated_at"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="client",
+            name="phone_digits",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.db.models.functions.text.Replace(
+                    django.db.models.functions.text.Replace(
+                        django.db.models.functions.text.Replace(
+                            django.db.models.functions.text.Replace(
+                                django.db.models.functions.text.Replace(
+                                    django.db.models.functions.text.Replace(
+                                        django.db.models.functions.text.Replace(
+                                            models.F("phone_num"),
+                                            models.Value(" "),
+                                            models.Value(""),
+                                        ),
+                                        models.Value("-"),
+                                        models.Value(""),
+                                    ),
+                                    models.Value("("),
+                                    models.Value(""),
+                                ),
+                                models.Value(")"),
+                                models.Value(""),
+                            ),
+                            models.Value("+"),
+                            models.Value(""),
+                        ),
+                        models.Value("."),
+                        models.Value(""),
+                    ),
+                    models.Value("/"),
+                    models.Value(""),
+                ),
+                output_field=models.CharField(max_length=50),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(fields=["phone_digits"], name="client_phone_digits_idx"),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
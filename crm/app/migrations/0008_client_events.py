@@ -0,0 +1,81 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:49
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# PostgreSQL keeps the history in monthly range partitions, created ahead of
+# time by the create_event_partitions command. Rows outside them land in the
+# default partition. The primary key has to include the partition key.
+PARTITIONED_TABLE = [
+    "DROP TABLE app_clientevent",
+    """
+    CREATE TABLE app_clientevent (
+        id bigint GENERATED BY DEFAULT AS IDENTITY,
+        client_id bigint NOT NULL,
+        kind varchar(20) NOT NULL,
+        changes jsonb NOT NULL,
+        actor_id integer NULL,
+        created_at timestamp with time zone NOT NULL,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at)
+    """,
+    "CREATE TABLE app_clientevent_default PARTITION OF app_clientevent DEFAULT",
+    "CREATE INDEX client_event_timeline_idx ON app_clientevent (client_id, created_at)",
+]
+
+
+def partition_events(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for sql in PARTITIONED_TABLE:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0007_client_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClientEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("client_id", models.BigIntegerField()),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("created", "Создан"),
+                            ("updated", "Изменён"),
+                            ("promoted", "Переведён в активные"),
+                            ("contract_attached", "Прикреплён контракт"),
+                            ("deleted", "Удалён"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("changes", models.JSONField(default=dict)),
+                ("actor_id", models.IntegerField(null=True)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["client_id", "created_at"],
+                        name="client_event_timeline_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(partition_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:52
+
+import app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0008_client_events"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contract",
+            name="document_name",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name="contract",
+            name="document",
+            field=models.FileField(
+                blank=True,
+                max_length=200,
+                null=True,
+                storage=app.storage.get_document_storage,
+                upload_to="contracts/documents/",
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.2 on 2026-10-18 18:53
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import DurationField, ExpressionWrapper, F, Value
+
+
+def fill_expires_at(apps, schema_editor):
+    # One UPDATE; from now on Contract.save() keeps the column in sync.
+    Contract = apps.get_model("app", "Contract")
+    period = ExpressionWrapper(F("validity_period") * Value(timedelta(days=1)), output_field=DurationField())
+    Contract.objects.filter(created_at__isnull=False).update(expires_at=F("created_at") + period)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0009_contract_document_storage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="client",
+            name="contract_expiring",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name="contract",
+            name="expires_at",
+            field=models.DateTimeField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(
+                condition=models.Q(("contract_expiring", True)),
+                fields=["contract"],
+                name="client_contract_expiring_idx",
+            ),
+        ),
+        migrations.RunPython(fill_expires_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.2 on 2026-10-18 19:06
+
+from django.db import migrations, models
+from django.db.models import Func, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_clients(clients):
+    return Coalesce(
+        Subquery(clients.order_by().annotate(total=Func("pk", function="COUNT")).values("total")),
+        Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def fill_counters(apps, schema_editor):
+    # One UPDATE; from now on the Client signals keep the columns in sync.
+    Advert = apps.get_model("app", "Advert")
+    Client = apps.get_model("app", "Client")
+    clients = Client.objects.filter(advert=OuterRef("pk"))
+    Advert.objects.update(
+        client_count=count_clients(clients),
+        active_client_count=count_clients(clients.filter(active=True)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0010_contract_expiry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="advert",
+            name="client_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="advert",
+            name="active_client_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="advertstatistics",
+            name="client_count",
+        ),
+        migrations.RemoveField(
+            model_name="advertstatistics",
+            name="converted_count",
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-18 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0011_advert_client_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExpiryScan",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("horizon", models.DateTimeField(null=True)),
+                ("started_at", models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
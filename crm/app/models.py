@@ -1,4 +1,40 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Replace
+from django.utils import timezone
+
+from .storage import get_document_storage
+
+PHONE_SEPARATORS = (" ", "-", "(", ")", "+", ".", "/")
+
+
+def digits_only(field):
+    expression = models.F(field)
+    for separator in PHONE_SEPARATORS:
+        expression = Replace(expression, models.Value(separator), models.Value(""))
+    return expression
+
+
+def contract_expiry(created_at, validity_period):
+    if created_at is None:
+        return None
+    return created_at + timedelta(days=validity_period or 0)
+
+
+class TimestampedQuerySet(models.QuerySet):
+    # update() and bulk_update() skip auto_now; ETags and exports rely on
+    # updated_at, so writes that bypass save() go through these.
+
+    def touch(self, now=None, **fields):
+        return self.update(updated_at=now or timezone.now(), **fields)
+
+    def bulk_touch(self, objects, fields):
+        now = timezone.now()
+        for obj in objects:
+            obj.updated_at = now
+        return self.bulk_update(objects, [*fields, "updated_at"])
 
 
 class Advert(models.Model):
@@ -6,15 +42,56 @@ class Advert(models.Model):
     description = models.TextField(null=False, blank=True)
     channel = models.CharField(max_length=100, db_index=True)
     budget = models.DecimalField(default=0, max_digits=10, decimal_places=2)
+    client_count = models.IntegerField(default=0, editable=False)
+    active_client_count = models.IntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = TimestampedQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        # The counters are changed in place by UPDATE ... SET count = count + 1
+        # (see statistics.update_advert_counts), so the values on this
+        # instance may be stale and are never written back.
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ADVERT_COUNTERS and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+ADVERT_COUNTERS = ("client_count", "active_client_count")
 
 
 class Contract(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(null=True, blank=True)
-    document = models.FileField(null=True, blank=True, upload_to='contracts/documents/')
+    document = models.FileField(
+        null=True,
+        blank=True,
+        upload_to='contracts/documents/',
+        storage=get_document_storage,
+        max_length=200,
+    )
+    document_name = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(null=True)
     validity_period = models.IntegerField(default=0)
+    expires_at = models.DateTimeField(null=True, editable=False, db_index=True)
     price = models.DecimalField(default=0, max_digits=10, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = TimestampedQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        # Kept in sync here rather than as a generated column: SQLite cannot
+        # add days to a datetime with a deterministic expression.
+        self.expires_at = contract_expiry(self.created_at, self.validity_period)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"created_at", "validity_period"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "expires_at"}
+        super().save(*args, **kwargs)
 
 
 class Client(models.Model):
@@ -22,13 +99,112 @@ class Client(models.Model):
     surname = models.CharField(max_length=100, null=False)
     middle_name = models.CharField(max_length=100, null=True, blank=True)
     phone_num = models.CharField(max_length=50, null=False)
+    phone_digits = models.GeneratedField(
+        expression=digits_only("phone_num"),
+        output_field=models.CharField(max_length=50),
+        db_persist=True,
+    )
     email = models.CharField(max_length=100, null=False)
     advert = models.ForeignKey(Advert, null=True, blank=True, on_delete=models.PROTECT)
     active = models.BooleanField(default=False)
     contract = models.ForeignKey(Contract, null=True, blank=True, on_delete=models.PROTECT)
+    contract_expiring = models.BooleanField(default=False, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TimestampedQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        # scan_contract_expiry only follows contracts, so a client that is
+        # given another contract is flagged here.
+        if self.contract_id is None or self._meta.get_field("contract").is_cached(self):
+            horizon = timezone.now() + timedelta(days=settings.CONTRACT_EXPIRY_DAYS)
+            expires_at = self.contract.expires_at if self.contract_id is not None else None
+            self.contract_expiring = expires_at is not None and expires_at < horizon
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and {"contract", "contract_id"} & set(update_fields):
+                kwargs["update_fields"] = {*update_fields, "contract_expiring"}
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["surname", "name", "id"],
+                condition=models.Q(active=True),
+                name="client_active_name_idx",
+            ),
+            models.Index(
+                fields=["surname", "name", "id"],
+                condition=models.Q(active=False),
+                name="client_potential_name_idx",
+            ),
+            models.Index(fields=["email"], name="client_email_idx"),
+            models.Index(fields=["phone_num"], name="client_phone_num_idx"),
+            models.Index(fields=["phone_digits"], name="client_phone_digits_idx"),
+            models.Index(fields=["active", "updated_at"], name="client_active_updated_idx"),
+            models.Index(
+                fields=["contract"],
+                condition=models.Q(contract_expiring=True),
+                name="client_contract_expiring_idx",
+            ),
+        ]
 
 
 class Service(models.Model):
     name = models.CharField(null=False, max_length=100)
     description = models.TextField(blank=True)
     price = models.DecimalField(null=False, max_digits=10, decimal_places=2, default=None)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = TimestampedQuerySet.as_manager()
+
+
+class StatisticsSnapshot(models.Model):
+    active_clients = models.IntegerField(default=0)
+    advert_budget = models.DecimalField(default=0, max_digits=14, decimal_places=2)
+    contract_revenue = models.DecimalField(default=0, max_digits=14, decimal_places=2)
+    rebuilt_at = models.DateTimeField(null=True)
+
+
+class ExpiryScan(models.Model):
+    # Single row: how far the last scan_contract_expiry run looked ahead and
+    # when it started, so the next run only reads what changed since.
+    horizon = models.DateTimeField(null=True)
+    started_at = models.DateTimeField(null=True)
+
+
+class AdvertStatistics(models.Model):
+    advert = models.OneToOneField(
+        Advert,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="statistics",
+    )
+    revenue = models.DecimalField(default=0, max_digits=14, decimal_places=2)
+
+
+class ClientEvent(models.Model):
+    # Append-only history. client_id is not a foreign key so the events of a
+    # deleted client stay, and so the PostgreSQL table can be partitioned.
+    CREATED = "created"
+    UPDATED = "updated"
+    PROMOTED = "promoted"
+    CONTRACT_ATTACHED = "contract_attached"
+    DELETED = "deleted"
+    KINDS = [
+        (CREATED, "Создан"),
+        (UPDATED, "Изменён"),
+        (PROMOTED, "Переведён в активные"),
+        (CONTRACT_ATTACHED, "Прикреплён контракт"),
+        (DELETED, "Удалён"),
+    ]
+
+    client_id = models.BigIntegerField()
+    kind = models.CharField(max_length=20, choices=KINDS)
+    changes = models.JSONField(default=dict)
+    actor_id = models.IntegerField(null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["client_id", "created_at"], name="client_event_timeline_idx"),
+        ]
@@ -0,0 +1,105 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder rounds datetimes to milliseconds, which would skip
+    # rows whose keys differ only in the microseconds.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([direction, list(values)], cls=CursorEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        direction, values = json.loads(payload)
+    except (binascii.Error, ValueError, TypeError):
+        raise Http404("Invalid cursor")
+    if direction not in ("next", "prev") or not isinstance(values, list) or len(values) != size:
+        raise Http404("Invalid cursor")
+    return direction, values
+
+
+def keyset_filter(fields, values, lookup):
+    # Row comparison (f1, f2, ...) > (v1, v2, ...) spelled out with Q objects.
+    # The leading-column bound lets the database range-scan the composite index.
+    condition = Q()
+    for i, field in enumerate(fields):
+        step = Q(**{f"{field}__{lookup}": values[i]})
+        for prev_field, prev_value in zip(fields[:i], values[:i]):
+            step &= Q(**{prev_field: prev_value})
+        condition |= step
+    if len(fields) == 1:
+        return condition
+    return Q(**{f"{fields[0]}__{lookup}e": values[0]}) & condition
+
+
+class KeysetPaginationMixin:
+    keyset_fields = ("pk",)
+    keyset_descending = False
+    cursor_param = "cursor"
+    page_size = None
+
+    def get_page_size(self):
+        return self.page_size or settings.LIST_PAGE_SIZE
+
+    def row_key(self, row):
+        if isinstance(row, dict):
+            return [row[field] for field in self.keyset_fields]
+        return [getattr(row, field) for field in self.keyset_fields]
+
+    def keyset_page(self, queryset):
+        fields = self.keyset_fields
+        size = self.get_page_size()
+        cursor = self.request.GET.get(self.cursor_param)
+        direction, values = decode_cursor(cursor, len(fields)) if cursor else ("next", None)
+
+        # A newest-first list walks the same index backwards: "next" becomes
+        # a less-than bound with descending order and "prev" the opposite.
+        forward = (direction == "next") != self.keyset_descending
+        lookup = "gt" if forward else "lt"
+        order = fields if forward else [f"-{field}" for field in fields]
+        if values is not None:
+            queryset = queryset.filter(keyset_filter(fields, values, lookup))
+        return queryset.order_by(*order)[:size + 1], direction, values
+
+    def finish_page(self, rows, direction, values):
+        size = self.get_page_size()
+        has_more = len(rows) > size
+        if direction == "next":
+            rows = rows[:size]
+            next_cursor = encode_cursor("next", self.row_key(rows[-1])) if has_more else None
+            prev_cursor = encode_cursor("prev", self.row_key(rows[0])) if rows and values else None
+        else:
+            rows = rows[:size][::-1]
+            prev_cursor = encode_cursor("prev", self.row_key(rows[0])) if has_more else None
+            next_cursor = encode_cursor("next", self.row_key(rows[-1])) if rows else None
+        return rows, next_cursor, prev_cursor
+
+    def paginate_keyset(self, queryset):
+        page, direction, values = self.keyset_page(queryset)
+        return self.finish_page(list(page), direction, values)
+
+    async def apaginate_keyset(self, queryset):
+        page, direction, values = self.keyset_page(queryset)
+        return self.finish_page([row async for row in page.aiterator()], direction, values)
+
+    def get_context_data(self, **kwargs):
+        if "object_list" not in kwargs:
+            rows, next_cursor, prev_cursor = self.paginate_keyset(self.object_list)
+            kwargs.update(object_list=rows, next_cursor=next_cursor, prev_cursor=prev_cursor)
+        return super().get_context_data(**kwargs)
@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.utils import timezone
+
+from . import events, statistics
+from .cache import bump_generation
+from .models import Client, ClientEvent
+
+
+def promote_clients(queryset):
+    with transaction.atomic():
+        # Lock the rows so a concurrent promotion cannot count a client twice.
+        rows = list(
+            queryset
+            .filter(active=False)
+            .select_for_update()
+            .order_by()
+            .values_list("pk", "advert_id")
+        )
+        if not rows:
+            return 0
+        # The active=False condition makes the transition happen once even
+        # where select_for_update() does not lock (SQLite).
+        now = timezone.now()
+        promoted = (
+            Client.objects
+            .filter(pk__in=[pk for pk, _ in rows], active=False)
+            .touch(now, active=True)
+        )
+        if not promoted:
+            return 0
+        if promoted != len(rows):
+            # Some of the rows were promoted concurrently. The ones changed
+            # here carry this update's timestamp and stay locked by it until
+            # the commit.
+            rows = list(
+                Client.objects
+                .filter(pk__in=[pk for pk, _ in rows], updated_at=now)
+                .values_list("pk", "advert_id")
+            )
+        statistics.clients_promoted([advert_id for _, advert_id in rows])
+        events.record(events.event(pk, ClientEvent.PROMOTED) for pk, _ in rows)
+    bump_generation(Client)
+    return promoted
@@ -0,0 +1,99 @@
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.mixins import UserPassesTestMixin
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
+
+_roles_cache = {}
+_roles_lock = threading.Lock()
+
+
+def _cached_roles(user_pk):
+    cached = _roles_cache.get(user_pk)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    return None
+
+
+def _store_roles(user_pk, roles):
+    ttl = settings.ROLE_CACHE_TTL
+    if ttl > 0:
+        with _roles_lock:
+            _roles_cache[user_pk] = (time.monotonic() + ttl, roles)
+    return roles
+
+
+def _load_roles(user):
+    roles = _cached_roles(user.pk)
+    if roles is None:
+        roles = _store_roles(user.pk, frozenset(user.groups.values_list("name", flat=True)))
+    return roles
+
+
+async def _aload_roles(user):
+    roles = _cached_roles(user.pk)
+    if roles is None:
+        names = [name async for name in user.groups.values_list("name", flat=True)]
+        roles = _store_roles(user.pk, frozenset(names))
+    return roles
+
+
+def get_user_roles(request):
+    roles = getattr(request, "_crm_roles", None)
+    if roles is None:
+        user = request.user
+        roles = _load_roles(user) if user.is_authenticated else frozenset()
+        request._crm_roles = roles
+    return roles
+
+
+async def aget_user_roles(request):
+    roles = getattr(request, "_crm_roles", None)
+    if roles is None:
+        user = await request.auser()
+        roles = await _aload_roles(user) if user.is_authenticated else frozenset()
+        request._crm_roles = roles
+    return roles
+
+
+def has_role(request, *roles):
+    if request.user.is_superuser:
+        return True
+    return not get_user_roles(request).isdisjoint(roles)
+
+
+async def ahas_role(request, *roles):
+    if (await request.auser()).is_superuser:
+        return True
+    return not (await aget_user_roles(request)).isdisjoint(roles)
+
+
+def invalidate_user_roles(*user_pks):
+    with _roles_lock:
+        for pk in user_pks:
+            _roles_cache.pop(pk, None)
+
+
+def clear_roles_cache():
+    with _roles_lock:
+        _roles_cache.clear()
+
+
+class RoleRequiredMixin(UserPassesTestMixin):
+    allowed_roles = ()
+
+    def test_func(self):
+        return has_role(self.request, *self.allowed_roles)
+
+
+class AsyncRoleRequiredMixin(RoleRequiredMixin):
+    async def dispatch(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), self.get_login_url(), self.get_redirect_field_name())
+        if not await ahas_role(request, *self.allowed_roles):
+            raise PermissionDenied(self.get_permission_denied_message())
+        # Skip UserPassesTestMixin.dispatch: its test would query synchronously.
+        return await super(UserPassesTestMixin, self).dispatch(request, *args, **kwargs)
@@ -0,0 +1,40 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Set for the duration of a read-only request that may be served by a replica.
+# A ContextVar follows the request into sync_to_async threads under ASGI.
+_read_from_replica = ContextVar("read_from_replica", default=False)
+
+ROUTED_APP_LABELS = {"app"}
+
+
+def set_replica_reads(enabled):
+    _read_from_replica.set(enabled)
+
+
+class ReplicaRouter:
+    # Sessions, users and groups always use the primary: a login or logout
+    # must be visible on the very next request.
+
+    def db_for_read(self, model, **hints):
+        if (
+            settings.DATABASE_REPLICAS
+            and _read_from_replica.get()
+            and model._meta.app_label in ROUTED_APP_LABELS
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Explicit, or Django would write an instance back to the replica it was read from.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
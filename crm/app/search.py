@@ -0,0 +1,93 @@
+import heapq
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .models import Client
+
+SEARCH_FIELDS = ("surname", "name", "middle_name", "email")
+SEARCH_CONFIG = "simple"
+RESULT_FIELDS = ("pk", "surname", "name", "middle_name", "email", "phone_num", "active")
+MIN_TERM_LENGTH = 2
+MIN_PHONE_DIGITS = 3
+
+WORD_RE = re.compile(r"[\w@.\-]+")
+
+
+def parse_term(term):
+    term = term.strip().lower()
+    if len(term) < MIN_TERM_LENGTH:
+        return [], ""
+    digits = re.sub(r"\D", "", term)
+    return WORD_RE.findall(term), digits if len(digits) >= MIN_PHONE_DIGITS else ""
+
+
+def search_vector():
+    # Must stay identical to the client_search_vector_idx expression in
+    # migration 0007, otherwise PostgreSQL will not use the index.
+    return SearchVector(*SEARCH_FIELDS, config=SEARCH_CONFIG)
+
+
+def prefix_query(words):
+    # Every word is a prefix, so "ив пет" finds "Иванов Пётр" while typing.
+    raw = " & ".join(f"'{word}':*" for word in words)
+    return SearchQuery(raw, config=SEARCH_CONFIG, search_type="raw")
+
+
+def postgres_search(queryset, words, digits):
+    condition = Q()
+    ranks = []
+    if words:
+        query = prefix_query(words)
+        queryset = queryset.annotate(document=search_vector())
+        condition |= Q(document=query) | Q(surname__trigram_word_similar=" ".join(words))
+        ranks += [
+            SearchRank(F("document"), query),
+            TrigramWordSimilarity(" ".join(words), "surname"),
+        ]
+    if digits:
+        condition |= Q(phone_digits__contains=digits)
+        ranks.append(Case(When(phone_digits__startswith=digits, then=Value(1.0)), default=Value(0.5)))
+    rank = Greatest(*ranks) if len(ranks) > 1 else ranks[0]
+    return queryset.filter(condition).annotate(rank=rank)
+
+
+def fallback_rank(row, words, digits):
+    values = [(row[field] or "").casefold() for field in SEARCH_FIELDS]
+    matched = bool(words) and all(any(word in value for value in values) for word in words)
+    if not matched and not (digits and digits in row["phone_digits"]):
+        return None
+    if words and values[0].startswith(words[0]):
+        return 1.0
+    if (words and values[1].startswith(words[0])) or (digits and row["phone_digits"].startswith(digits)):
+        return 0.8
+    return 0.5
+
+
+def fallback_search(queryset, words, digits, limit):
+    # SQLite: LIKE and LOWER() only fold ASCII case there, so "ив" would not
+    # find "Иванов". Substring matches scan the whole table anyway; the rows
+    # are matched in Python instead and only the best `limit` are kept.
+    words = [word.casefold() for word in words]
+    rows = (
+        dict(((field, row[field]) for field in RESULT_FIELDS), rank=rank)
+        for row in queryset.values(*RESULT_FIELDS, "phone_digits").iterator()
+        if (rank := fallback_rank(row, words, digits)) is not None
+    )
+    return heapq.nsmallest(limit, rows, key=lambda row: (-row["rank"], row["surname"], row["name"], row["pk"]))
+
+
+def search_clients(term, active=None, limit=None):
+    words, digits = parse_term(term)
+    if not words and not digits:
+        return []
+    queryset = Client.objects.all() if active is None else Client.objects.filter(active=active)
+    limit = limit or settings.SEARCH_RESULTS_LIMIT
+    if connections[queryset.db].vendor != "postgresql":
+        return fallback_search(queryset, words, digits, limit)
+    queryset = postgres_search(queryset, words, digits)
+    return queryset.values(*RESULT_FIELDS, "rank").order_by("-rank", "surname", "name", "pk")[:limit]
@@ -0,0 +1,285 @@
+import csv
+import io
+import random
+from datetime import timedelta
+from decimal import Decimal
+from functools import lru_cache
+
+from django.db import connections, models, transaction
+from django.utils import timezone
+
+from .cache import bump_generation
+from .models import Advert, Client, Contract, Service, contract_expiry
+from .statistics import rebuild_statistics
+
+SCALES = {
+    "10k": {"clients": 10_000, "adverts": 1_000, "contracts": 1_000, "services": 100},
+    "100k": {"clients": 100_000, "adverts": 1_000, "contracts": 10_000, "services": 100},
+    "1m": {"clients": 1_000_000, "adverts": 1_000, "contracts": 100_000, "services": 100},
+}
+
+MALE_NAMES = (
+    "Александр", "Алексей", "Андрей", "Антон", "Артём", "Борис", "Вадим", "Валерий", "Василий", "Виктор",
+    "Владимир", "Вячеслав", "Геннадий", "Георгий", "Денис", "Дмитрий", "Евгений", "Егор", "Иван", "Игорь",
+    "Илья", "Кирилл", "Константин", "Леонид", "Максим", "Михаил", "Никита", "Николай", "Олег", "Павел",
+    "Пётр", "Роман", "Сергей", "Степан", "Тимур", "Фёдор", "Юрий", "Ярослав",
+)
+FEMALE_NAMES = (
+    "Александра", "Алина", "Алла", "Анастасия", "Анна", "Валентина", "Валерия", "Вера", "Виктория", "Галина",
+    "Дарья", "Евгения", "Екатерина", "Елена", "Елизавета", "Жанна", "Ирина", "Кристина", "Ксения", "Лариса",
+    "Любовь", "Людмила", "Маргарита", "Марина", "Мария", "Надежда", "Наталья", "Нина", "Оксана", "Ольга",
+    "Полина", "Светлана", "София", "Татьяна", "Юлия", "Яна",
+)
+# Male surnames; the female form is derived by female_surname().
+SURNAMES = (
+    "Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов", "Новиков", "Фёдоров",
+    "Морозов", "Волков", "Алексеев", "Лебедев", "Семёнов", "Егоров", "Павлов", "Козлов", "Степанов", "Николаев",
+    "Орлов", "Андреев", "Макаров", "Никитин", "Захаров", "Зайцев", "Соловьёв", "Борисов", "Яковлев", "Григорьев",
+    "Романов", "Воробьёв", "Сергеев", "Кузьмин", "Фролов", "Александров", "Дмитриев", "Королёв", "Гусев", "Киселёв",
+    "Ильин", "Максимов", "Поляков", "Сорокин", "Виноградов", "Ковалёв", "Белов", "Медведев", "Антонов", "Тарасов",
+    "Жуков", "Баранов", "Филиппов", "Комаров", "Давыдов", "Беляев", "Герасимов", "Богданов", "Осипов", "Сидоров",
+    "Матвеев", "Титов", "Марков", "Миронов", "Крылов", "Куликов", "Карпов", "Власов", "Мельников", "Денисов",
+    "Гаврилов", "Тихонов", "Казаков", "Афанасьев", "Данилов", "Савельев", "Тимофеев", "Фомин", "Чернов", "Абрамов",
+    "Мартынов", "Ефимов", "Федотов", "Щербаков", "Назаров", "Калинин", "Исаев", "Чернышёв", "Быков", "Маслов",
+    "Родионов", "Коновалов", "Лазарев", "Воронин", "Климов", "Филатов", "Пономарёв", "Голубев", "Кудрявцев",
+    "Прохоров", "Наумов", "Потапов", "Журавлёв", "Овчинников", "Трофимов", "Леонов", "Соболев", "Ермаков",
+    "Колесников", "Гончаров", "Емельянов", "Никифоров", "Грачёв", "Котов", "Гришин", "Ефремов", "Архипов",
+    "Громов", "Кириллов", "Малышев", "Панов", "Моисеев", "Румянцев", "Акимов", "Кондратьев", "Бирюков",
+    "Горбунов", "Анисимов", "Ерёмин", "Тихомиров", "Галкин", "Лукьянов", "Михеев", "Скворцов", "Юдин", "Белоусов",
+    "Нестеров", "Симонов", "Прокофьев", "Харитонов", "Князев", "Цветков", "Левин", "Митрофанов", "Воронов",
+    "Аксёнов", "Софронов", "Мальцев", "Логинов", "Горшков", "Савин", "Краснов", "Майоров", "Демидов", "Елисеев",
+    "Рыбаков", "Сафонов", "Плотников", "Дёмин", "Хохлов", "Хомяков", "Русаков", "Дьячков", "Островский",
+    "Вишневский", "Покровский", "Троицкий", "Успенский", "Введенский", "Садовский", "Зеленский", "Каменский",
+)
+# Patronymics of the names above that do not simply add -ович/-овна.
+PATRONYMICS = {
+    "Алексей": ("Алексеевич", "Алексеевна"),
+    "Андрей": ("Андреевич", "Андреевна"),
+    "Валерий": ("Валерьевич", "Валерьевна"),
+    "Василий": ("Васильевич", "Васильевна"),
+    "Геннадий": ("Геннадьевич", "Геннадьевна"),
+    "Георгий": ("Георгиевич", "Георгиевна"),
+    "Дмитрий": ("Дмитриевич", "Дмитриевна"),
+    "Евгений": ("Евгеньевич", "Евгеньевна"),
+    "Игорь": ("Игоревич", "Игоревна"),
+    "Илья": ("Ильич", "Ильинична"),
+    "Михаил": ("Михайлович", "Михайловна"),
+    "Никита": ("Никитич", "Никитична"),
+    "Николай": ("Николаевич", "Николаевна"),
+    "Павел": ("Павлович", "Павловна"),
+    "Пётр": ("Петрович", "Петровна"),
+    "Сергей": ("Сергеевич", "Сергеевна"),
+    "Юрий": ("Юрьевич", "Юрьевна"),
+}
+EMAIL_DOMAINS = ("mail.ru", "yandex.ru", "gmail.com", "inbox.ru", "bk.ru", "rambler.ru", "list.ru")
+TRANSLIT = dict(zip(
+    "абвгдеёжзийклмнопрстуфхцчшщъыьэюя",
+    (
+        "a", "b", "v", "g", "d", "e", "e", "zh", "z", "i", "y", "k", "l", "m", "n", "o", "p", "r", "s", "t",
+        "u", "f", "kh", "ts", "ch", "sh", "shch", "", "y", "", "e", "yu", "ya",
+    ),
+))
+CHANNELS = (
+    "телевидение", "радио", "контекстная реклама", "соцсети", "email-рассылка", "наружная реклама",
+    "печатные издания", "партнёры", "выставки", "рекомендации",
+)
+CAMPAIGNS = (
+    "Весенняя акция", "Летняя распродажа", "Осенний старт", "Новогоднее предложение", "Чёрная пятница",
+    "Запуск продукта", "Программа лояльности", "Бизнес-тариф", "Скидка для новых клиентов", "Ребрендинг",
+)
+SERVICES = (
+    "Внедрение CRM", "Техническая поддержка", "Обучение сотрудников", "Интеграция с 1С", "Аудит продаж",
+    "Настройка телефонии", "Аналитика и отчёты", "Миграция данных", "Доработка под заказ", "Хостинг",
+)
+VALIDITY_PERIODS = (30, 90, 180, 365, 730)
+
+
+def female_surname(surname):
+    if surname.endswith("ий"):
+        return surname[:-2] + "ая"
+    return surname + "а"
+
+
+def patronymic(name, female):
+    male_form, female_form = PATRONYMICS.get(name, (name + "ович", name + "овна"))
+    return female_form if female else male_form
+
+
+@lru_cache(maxsize=None)
+def translit(text):
+    return "".join(TRANSLIT.get(char, char) for char in text.lower())
+
+
+# Column-wise generation: every column of a chunk is drawn in one call and
+# the rows are zipped at the end, which is several times faster than
+# building one object at a time.
+
+def advert_rows(rng, start, count):
+    campaigns = rng.choices(CAMPAIGNS, k=count)
+    channels = rng.choices(CHANNELS, k=count)
+    budgets = [Decimal(cents) / 100 for cents in rng.choices(range(100_000, 50_000_000), k=count)]
+    names = [f"{campaign} {start + i + 1}" for i, campaign in enumerate(campaigns)]
+    return ("name", "channel", "budget"), list(zip(names, channels, budgets))
+
+
+def service_rows(rng, start, count):
+    names = [f"{name} {start + i + 1}" for i, name in enumerate(rng.choices(SERVICES, k=count))]
+    prices = [Decimal(cents) / 100 for cents in rng.choices(range(10_000, 10_000_000), k=count)]
+    return ("name", "price"), list(zip(names, prices))
+
+
+def contract_rows(rng, start, count, now):
+    created = [now - timedelta(days=days) for days in rng.choices(range(730), k=count)]
+    periods = rng.choices(VALIDITY_PERIODS, k=count)
+    prices = [Decimal(cents) / 100 for cents in rng.choices(range(1_000_000, 100_000_000), k=count)]
+    names = [f"Договор № {start + i + 1:07d}" for i in range(count)]
+    expires = [contract_expiry(created_at, period) for created_at, period in zip(created, periods)]
+    return (
+        ("name", "created_at", "validity_period", "expires_at", "price"),
+        list(zip(names, created, periods, expires, prices)),
+    )
+
+
+def client_rows(rng, start, count, active_ratio, advert_ids, contract_ids):
+    female = [value < 0.5 for value in (rng.random() for _ in range(count))]
+    names = [
+        rng.choice(FEMALE_NAMES) if is_female else rng.choice(MALE_NAMES)
+        for is_female in female
+    ]
+    fathers = rng.choices(MALE_NAMES, k=count)
+    surnames = [
+        female_surname(surname) if is_female else surname
+        for surname, is_female in zip(rng.choices(SURNAMES, k=count), female)
+    ]
+    middle_names = [patronymic(father, is_female) for father, is_female in zip(fathers, female)]
+    phones = [
+        f"+7 ({number // 10_000_000:03d}) {number // 10_000 % 1000:03d}-{number // 100 % 100:02d}-{number % 100:02d}"
+        for number in rng.choices(range(9_000_000_000, 10_000_000_000), k=count)
+    ]
+    emails = [
+        f"{translit(surname)}.{translit(name[0])}{start + i}@{domain}"
+        for i, (surname, name, domain) in enumerate(zip(surnames, names, rng.choices(EMAIL_DOMAINS, k=count)))
+    ]
+    active = [value < active_ratio for value in (rng.random() for _ in range(count))]
+    adverts = rng.choices(advert_ids, k=count) if advert_ids else [None] * count
+    contracts = rng.choices(contract_ids, k=count) if contract_ids else [None] * count
+    contracts = [contract if is_active else None for contract, is_active in zip(contracts, active)]
+    return (
+        ("name", "surname", "middle_name", "phone_num", "email", "advert_id", "active", "contract_id"),
+        list(zip(names, surnames, middle_names, phones, emails, adverts, active, contracts)),
+    )
+
+
+# Values of these fields go to the driver as they are.
+PLAIN_FIELDS = (models.CharField, models.TextField, models.IntegerField, models.BooleanField, models.ForeignKey)
+
+
+def complete_rows(model, fields, rows, now, prepare=None):
+    # Raw INSERTs and COPY do not apply model defaults, so every other column
+    # gets its default here and auto_now columns the current time. prepare()
+    # converts values for the database; constant ones are converted once.
+    columns = [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key and not field.generated
+    ]
+    given = {name: i for i, name in enumerate(fields)}
+    picks = []
+    for field in columns:
+        if field.attname in given:
+            convert = None if prepare is None or isinstance(field, PLAIN_FIELDS) else field
+            picks.append((given[field.attname], convert, None))
+        else:
+            default = now if getattr(field, "auto_now", False) else field.get_default()
+            picks.append((None, None, default if prepare is None else prepare(field, default)))
+    return columns, (
+        [
+            default if index is None else row[index] if convert is None else prepare(convert, row[index])
+            for index, convert, default in picks
+        ]
+        for row in rows
+    )
+
+
+def executemany_insert(model, fields, rows, now):
+    connection = connections["default"]
+    columns, values = complete_rows(
+        model, fields, rows, now, prepare=lambda field, value: field.get_db_prep_save(value, connection)
+    )
+    quote = connection.ops.quote_name
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        quote(model._meta.db_table),
+        ", ".join(quote(field.column) for field in columns),
+        ", ".join(["%s"] * len(columns)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, list(values))
+
+
+def copy_insert(model, fields, rows, now):
+    columns, values = complete_rows(model, fields, rows, now)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in values:
+        writer.writerow([r"\N" if value is None else value for value in row])
+
+    quote = connections["default"].ops.quote_name
+    sql = "COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL '\\N')".format(
+        quote(model._meta.db_table),
+        ", ".join(quote(field.column) for field in columns),
+    )
+    with connections["default"].cursor() as cursor:
+        if hasattr(cursor.cursor, "copy"):
+            # psycopg 3
+            with cursor.cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+        else:
+            buffer.seek(0)
+            cursor.cursor.copy_expert(sql, buffer)
+
+
+def insert_chunks(insert, model, generate, total, chunk_size, now):
+    for start in range(0, total, chunk_size):
+        fields, rows = generate(start, min(chunk_size, total - start))
+        insert(model, fields, rows, now)
+
+
+def seed_dataset(
+    clients,
+    adverts,
+    contracts,
+    services=0,
+    active_ratio=0.5,
+    chunk_size=10_000,
+    seed=0,
+    use_copy=None,
+):
+    # Adds synthetic rows; the same seed always generates the same data.
+    # Rows skip the ORM (a multi-row executemany, or COPY on PostgreSQL by
+    # default) and signals do not run, so the statistics snapshot is rebuilt
+    # and the list caches invalidated at the end.
+    rng = random.Random(seed)
+    now = timezone.now()
+    if use_copy is None:
+        use_copy = connections["default"].vendor == "postgresql"
+    insert = copy_insert if use_copy else executemany_insert
+
+    with transaction.atomic():
+        insert_chunks(insert, Advert, lambda start, count: advert_rows(rng, start, count), adverts, chunk_size, now)
+        insert_chunks(insert, Service, lambda start, count: service_rows(rng, start, count), services, chunk_size, now)
+        insert_chunks(
+            insert, Contract, lambda start, count: contract_rows(rng, start, count, now), contracts, chunk_size, now
+        )
+        advert_ids = list(Advert.objects.order_by("pk").values_list("pk", flat=True))
+        contract_ids = list(Contract.objects.order_by("pk").values_list("pk", flat=True))
+        insert_chunks(
+            insert,
+            Client,
+            lambda start, count: client_rows(rng, start, count, active_ratio, advert_ids, contract_ids),
+            clients,
+            chunk_size,
+            now,
+        )
+        rebuild_statistics()
+
+    for model in (Advert, Contract, Service, Client):
+        bump_generation(model)
@@ -0,0 +1,148 @@
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import events, statistics
+from .cache import bump_generation
+from .models import Advert, AdvertStatistics, Client, ClientEvent, Contract, Service
+from .roles import clear_roles_cache, invalidate_user_roles
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        invalidate_user_roles(instance.pk)
+    elif pk_set:
+        invalidate_user_roles(*pk_set)
+    else:
+        clear_roles_cache()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, **kwargs):
+    clear_roles_cache()
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_user_roles(instance.pk)
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+@receiver(post_save, sender=Advert)
+@receiver(post_delete, sender=Advert)
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_fragments(sender, **kwargs):
+    bump_generation(sender)
+
+
+# Statistics snapshot maintenance. post_init remembers the values an instance
+# was loaded with so post_save can apply the difference instead of recounting.
+# Instances loaded with those fields deferred are skipped: save() only writes
+# the fields that were loaded, so it cannot change them.
+
+def decimal_value(instance, name):
+    return instance._meta.get_field(name).to_python(getattr(instance, name))
+
+
+CLIENT_STATE_FIELDS = ("advert_id", "active", "contract_id")
+
+
+def client_state(instance):
+    return tuple(getattr(instance, field) for field in CLIENT_STATE_FIELDS)
+
+
+@receiver(post_init, sender=Client)
+def client_loaded(sender, instance, **kwargs):
+    if all(field in instance.__dict__ for field in CLIENT_STATE_FIELDS):
+        instance._statistics_state = client_state(instance)
+
+
+@receiver(post_save, sender=Client)
+def client_saved(sender, instance, created, **kwargs):
+    state = client_state(instance)
+    if created:
+        statistics.client_changed(None, state)
+    elif hasattr(instance, "_statistics_state"):
+        statistics.client_changed(instance._statistics_state, state)
+    instance._statistics_state = state
+
+
+@receiver(post_delete, sender=Client)
+def client_deleted(sender, instance, **kwargs):
+    statistics.client_changed(client_state(instance), None)
+
+
+@receiver(post_init, sender=Advert)
+def advert_loaded(sender, instance, **kwargs):
+    if "budget" in instance.__dict__:
+        instance._statistics_budget = decimal_value(instance, "budget")
+
+
+@receiver(post_save, sender=Advert)
+def advert_saved(sender, instance, created, **kwargs):
+    budget = decimal_value(instance, "budget")
+    if created:
+        AdvertStatistics.objects.get_or_create(advert=instance)
+        statistics.update_snapshot(advert_budget=budget)
+    elif hasattr(instance, "_statistics_budget"):
+        statistics.update_snapshot(advert_budget=budget - instance._statistics_budget)
+    instance._statistics_budget = budget
+
+
+@receiver(post_delete, sender=Advert)
+def advert_deleted(sender, instance, **kwargs):
+    if not statistics.in_bulk_delete():
+        statistics.update_snapshot(advert_budget=-decimal_value(instance, "budget"))
+
+
+@receiver(post_init, sender=Contract)
+def contract_loaded(sender, instance, **kwargs):
+    if "price" in instance.__dict__:
+        instance._statistics_price = decimal_value(instance, "price")
+
+
+@receiver(post_save, sender=Contract)
+def contract_saved(sender, instance, created, **kwargs):
+    price = decimal_value(instance, "price")
+    if created:
+        statistics.update_snapshot(contract_revenue=price)
+    elif hasattr(instance, "_statistics_price"):
+        statistics.contract_price_changed(instance.pk, price - instance._statistics_price)
+    instance._statistics_price = price
+
+
+@receiver(post_delete, sender=Contract)
+def contract_deleted(sender, instance, **kwargs):
+    if not statistics.in_bulk_delete():
+        statistics.update_snapshot(contract_revenue=-decimal_value(instance, "price"))
+
+
+# Client history. Like the statistics state above, post_init keeps the loaded
+# values so post_save can record what changed.
+
+@receiver(post_init, sender=Client)
+def client_history_loaded(sender, instance, **kwargs):
+    instance._event_fields = events.client_fields(instance)
+
+
+@receiver(post_save, sender=Client)
+def client_history_saved(sender, instance, created, **kwargs):
+    fields = events.client_fields(instance)
+    if created:
+        events.record([events.event(instance.pk, ClientEvent.CREATED, fields)])
+    else:
+        events.record(events.change_events(instance.pk, instance._event_fields, fields))
+    instance._event_fields = fields
+
+
+@receiver(post_delete, sender=Client)
+def client_history_deleted(sender, instance, **kwargs):
+    events.record([events.event(instance.pk, ClientEvent.DELETED, events.client_fields(instance))])
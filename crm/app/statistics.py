@@ -0,0 +1,233 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Func, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
+
+from .models import Advert, AdvertStatistics, Client, Contract, StatisticsSnapshot
+
+SNAPSHOT_PK = 1
+
+# Set while a bulk delete runs; it subtracts the totals of all its rows with
+# one update_snapshot() instead of the post_delete handlers doing it per row.
+_bulk_delete = ContextVar("statistics_bulk_delete", default=False)
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def scalar(queryset, function, field, output_field):
+    # A plain Func is not treated as an aggregate, so no GROUP BY is added and
+    # the subquery returns a single row for the whole table.
+    return Coalesce(
+        Subquery(queryset.order_by().annotate(total=Func(F(field), function=function)).values("total")),
+        0,
+        output_field=output_field,
+    )
+
+
+def compute_statistics():
+    rows = list(
+        Advert.objects
+        .order_by("pk")
+        .values("pk")
+        .annotate(
+            revenue=Coalesce(Sum("client__contract__price"), 0, output_field=MONEY),
+            active_clients=scalar(Client.objects.filter(active=True), "COUNT", "pk", IntegerField()),
+            advert_budget=scalar(Advert.objects.all(), "SUM", "budget", MONEY),
+            contract_revenue=scalar(Contract.objects.all(), "SUM", "price", MONEY),
+        )
+    )
+    if rows:
+        totals = {key: rows[0][key] for key in ("active_clients", "advert_budget", "contract_revenue")}
+    else:
+        totals = {
+            "active_clients": Client.objects.filter(active=True).count(),
+            "advert_budget": 0,
+            "contract_revenue": Contract.objects.aggregate(total=Sum("price"))["total"] or 0,
+        }
+    adverts = [AdvertStatistics(advert_id=row["pk"], revenue=row["revenue"]) for row in rows]
+    return totals, adverts
+
+
+def recount_adverts():
+    # Repairs the counters kept by client_changed(); only adverts whose
+    # counters are wrong are written, and their number is returned.
+    clients = Client.objects.filter(advert=OuterRef("pk"))
+    counts = {
+        "client_count": scalar(clients, "COUNT", "pk", IntegerField()),
+        "active_client_count": scalar(clients.filter(active=True), "COUNT", "pk", IntegerField()),
+    }
+    stale = (
+        Advert.objects
+        .alias(**{f"actual_{field}": count for field, count in counts.items()})
+        .exclude(client_count=F("actual_client_count"), active_client_count=F("actual_active_client_count"))
+    )
+    return Advert.objects.filter(pk__in=stale.values("pk")).update(**counts)
+
+
+def rebuild_statistics():
+    with transaction.atomic():
+        recount_adverts()
+        totals, adverts = compute_statistics()
+        AdvertStatistics.objects.all().delete()
+        AdvertStatistics.objects.bulk_create(adverts)
+        snapshot, _ = StatisticsSnapshot.objects.update_or_create(
+            pk=SNAPSHOT_PK,
+            defaults=dict(totals, rebuilt_at=timezone.now()),
+        )
+    return snapshot
+
+
+def advert_statistics():
+    return (
+        AdvertStatistics.objects
+        .values(
+            "revenue",
+            name=F("advert__name"),
+            budget=F("advert__budget"),
+            client_count=F("advert__client_count"),
+            converted_count=F("advert__active_client_count"),
+            cost_per_acquisition=ExpressionWrapper(
+                F("advert__budget") / NullIf(F("advert__active_client_count"), 0),
+                output_field=MONEY,
+            ),
+        )
+        .order_by("advert_id")
+    )
+
+
+def get_statistics():
+    snapshot = StatisticsSnapshot.objects.filter(pk=SNAPSHOT_PK).first()
+    if snapshot is None:
+        snapshot = rebuild_statistics()
+    return {"snapshot": snapshot, "adverts": advert_statistics()}
+
+
+async def aget_statistics():
+    snapshot = await StatisticsSnapshot.objects.filter(pk=SNAPSHOT_PK).afirst()
+    if snapshot is None:
+        snapshot = await sync_to_async(rebuild_statistics)()
+    return {"snapshot": snapshot, "adverts": await alist(advert_statistics())}
+
+
+async def alist(queryset):
+    return [row async for row in queryset.aiterator()]
+
+
+def update_snapshot(**deltas):
+    deltas = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if deltas:
+        StatisticsSnapshot.objects.filter(pk=SNAPSHOT_PK).update(**deltas)
+
+
+@contextmanager
+def bulk_delete():
+    token = _bulk_delete.set(True)
+    try:
+        yield
+    finally:
+        _bulk_delete.reset(token)
+
+
+def in_bulk_delete():
+    return _bulk_delete.get()
+
+
+def update_advert_counts(advert_id, **deltas):
+    deltas = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if advert_id is not None and deltas:
+        Advert.objects.filter(pk=advert_id).update(**deltas)
+
+
+def update_advert_statistics(advert_id, **deltas):
+    deltas = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if advert_id is not None and deltas:
+        AdvertStatistics.objects.filter(advert_id=advert_id).update(**deltas)
+
+
+def client_changed(old, new):
+    # old/new are (advert_id, active, contract_id) tuples, None for a
+    # created/deleted client.
+    if old == new:
+        return
+    old_advert, old_active, old_contract = old or (None, False, None)
+    new_advert, new_active, new_contract = new or (None, False, None)
+    update_snapshot(active_clients=int(new_active) - int(old_active))
+
+    if old is not None and new is not None and old_advert == new_advert:
+        revenue = 0
+        if old_contract != new_contract:
+            prices = contract_prices(old_contract, new_contract)
+            revenue = prices.get(new_contract, 0) - prices.get(old_contract, 0)
+        update_advert_counts(new_advert, active_client_count=int(new_active) - int(old_active))
+        update_advert_statistics(new_advert, revenue=revenue)
+        return
+
+    prices = contract_prices(
+        old_contract if old_advert is not None else None,
+        new_contract if new_advert is not None else None,
+    )
+    update_advert_counts(old_advert, client_count=-1, active_client_count=-int(old_active))
+    update_advert_statistics(old_advert, revenue=-prices.get(old_contract, 0))
+    update_advert_counts(new_advert, client_count=1, active_client_count=int(new_active))
+    update_advert_statistics(new_advert, revenue=prices.get(new_contract, 0))
+
+
+def contract_prices(*contract_ids):
+    contract_ids = [pk for pk in contract_ids if pk is not None]
+    if not contract_ids:
+        return {}
+    return dict(Contract.objects.filter(pk__in=contract_ids).values_list("pk", "price"))
+
+
+def contract_price_changed(contract_id, delta):
+    if not delta:
+        return
+    update_snapshot(contract_revenue=delta)
+    clients_per_advert = (
+        Client.objects
+        .filter(contract_id=contract_id, advert__isnull=False)
+        .order_by()
+        .values_list("advert_id")
+        .annotate(clients=Count("pk"))
+    )
+    for advert_id, clients in clients_per_advert:
+        update_advert_statistics(advert_id, revenue=delta * clients)
+
+
+def clients_created(clients):
+    # bulk_create() sends no post_save, so batch inserts report here instead.
+    prices = contract_prices(*{client.contract_id for client in clients})
+    per_advert = {}
+    for client in clients:
+        if client.advert_id is not None:
+            deltas = per_advert.setdefault(client.advert_id, {"client_count": 0, "active_client_count": 0, "revenue": 0})
+            deltas["client_count"] += 1
+            deltas["active_client_count"] += int(client.active)
+            deltas["revenue"] += prices.get(client.contract_id, 0)
+    update_snapshot(active_clients=sum(client.active for client in clients))
+    for advert_id, deltas in per_advert.items():
+        revenue = deltas.pop("revenue")
+        update_advert_counts(advert_id, **deltas)
+        update_advert_statistics(advert_id, revenue=revenue)
+
+
+def clients_promoted(advert_ids):
+    # A bulk UPDATE sends no post_save; advert_ids has one entry per promoted client.
+    update_snapshot(active_clients=len(advert_ids))
+    for advert_id, count in Counter(advert_ids).items():
+        update_advert_counts(advert_id, active_client_count=count)
+
+
+def adverts_created(adverts):
+    # bulk_create() sends no post_save: create the statistics rows advert_saved() would.
+    AdvertStatistics.objects.bulk_create(AdvertStatistics(advert=advert) for advert in adverts)
+    update_snapshot(advert_budget=sum(advert.budget for advert in adverts))
+
+
+def contracts_created(contracts):
+    update_snapshot(contract_revenue=sum(contract.price for contract in contracts))
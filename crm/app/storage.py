@@ -0,0 +1,37 @@
+import hashlib
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    # Files are named after the SHA-256 of their content, so a document that
+    # is uploaded again is stored once and shared by the contracts using it.
+    # Stored files are therefore never deleted together with a contract.
+
+    def digest(self, content):
+        digest = getattr(content, "sha256", None)
+        if digest is None:
+            hasher = hashlib.sha256()
+            for chunk in content.chunks():
+                hasher.update(chunk)
+            digest = hasher.hexdigest()
+        return digest
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        directory, filename = posixpath.split(name)
+        digest = self.digest(content)
+        name = posixpath.join(directory, digest[:2], digest + posixpath.splitext(filename)[1].lower())
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+document_storage = ContentAddressedStorage()
+
+
+def get_document_storage():
+    return document_storage
@@ -1,29 +1,62 @@
-from random import choices
-from string import ascii_letters
-
-from django.contrib.auth.models import User
-from django.test import TestCase
+import csv
+import hashlib
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial
+from io import BytesIO, StringIO
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import Group, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, router, transaction
+from django.db.utils import load_backend
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 from django.urls import reverse
-
-from .models import Advert, Contract, Service, Client
+from django.utils import timezone
+
+from crm.sentry import traces_sampler
+
+from . import metrics
+from .cache import fragment_cache, get_generations
+from .events import buffered_events
+from .expiry import mark_expiring_clients
+from .factories import (
+    make_adverts,
+    make_clients,
+    make_contracts,
+    make_services,
+    make_superuser,
+    make_user,
+    random_text,
+)
+from .imports import import_clients, iter_csv_rows
+from .models import Advert, AdvertStatistics, Contract, Service, Client, ClientEvent, StatisticsSnapshot
+from .async_views import ASYNC_VARIANTS, AsyncStatisticsView
+from .promotion import promote_clients
+from .roles import clear_roles_cache, get_user_roles, has_role
+from .search import search_clients
+from .seed import seed_dataset
+from .statistics import aget_statistics, compute_statistics, get_statistics, rebuild_statistics, recount_adverts
+from .urls import urlpatterns
 
 
 class AdvertCreateViewTestCase(TestCase):
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
 
-        self.advert_name = "".join(choices(ascii_letters, k=10))
-        self.advert_description = "".join(choices(ascii_letters, k=10))
-        self.channel = "".join(choices(ascii_letters, k=10))
+        self.advert_name = random_text()
+        self.advert_description = random_text()
+        self.channel = random_text()
 
         Advert.objects\
             .filter(
@@ -62,12 +95,8 @@ class AdvertListViewTestCase(TestCase):
     ]
 
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
@@ -84,25 +113,13 @@ class AdvertListViewTestCase(TestCase):
 
 class AdvertDetailViewTestCase(TestCase):
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.advert, = make_adverts()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
 
-        self.advert = Advert.objects.create(
-            name="".join(choices(ascii_letters, k=10)),
-            description="".join(choices(ascii_letters, k=10)),
-            channel="".join(choices(ascii_letters, k=10))
-        )
-
-    def teardown(self) -> None:
-        self.advert.delete()
-
     def test_get_advert(self):
         response = self.client.get(
             reverse("app:advert_details", kwargs={"pk": self.advert.pk})
@@ -120,25 +137,13 @@ class AdvertDetailViewTestCase(TestCase):
 
 class AdvertUpdateViewTestCase(TestCase):
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.advert, = make_adverts()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
 
-        self.advert = Advert.objects.create(
-            name="".join(choices(ascii_letters, k=10)),
-            description="".join(choices(ascii_letters, k=10)),
-            channel="".join(choices(ascii_letters, k=10))
-        )
-
-    def teardown(self) -> None:
-        self.advert.delete()
-
     def test_update_advert(self):
         update_data = {
                 "name": "updated",
@@ -170,18 +175,14 @@ class AdvertUpdateViewTestCase(TestCase):
 
 class ContractCreateViewTestCase(TestCase):
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
 
-        self.contract_name = "".join(choices(ascii_letters, k=10))
-        self.contract_description = "".join(choices(ascii_letters, k=10))
+        self.contract_name = random_text()
+        self.contract_description = random_text()
 
         Contract.objects.filter(
             name=self.contract_name,
@@ -216,12 +217,8 @@ class ContractListViewTestCase(TestCase):
     ]
 
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
@@ -238,24 +235,13 @@ class ContractListViewTestCase(TestCase):
 
 class ContractDetailViewTestCase(TestCase):
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.contract, = make_contracts()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
 
-        self.contract = Contract.objects.create(
-            name="".join(choices(ascii_letters, k=10)),
-            description="".join(choices(ascii_letters, k=10)),
-        )
-
-    def teardown(self) -> None:
-        self.contract.delete()
-
     def test_get_advert(self):
         response = self.client.get(
             reverse("app:contract_details", kwargs={"pk": self.contract.pk})
@@ -273,24 +259,13 @@ class ContractDetailViewTestCase(TestCase):
 
 class ContractUpdateViewTestCase(TestCase):
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.contract, = make_contracts()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
 
-        self.contract = Contract.objects.create(
-            name="".join(choices(ascii_letters, k=10)),
-            description="".join(choices(ascii_letters, k=10)),
-        )
-
-    def teardown(self) -> None:
-        self.contract.delete()
-
     def test_update_contract(self):
         update_data = {
                 "name": "updated",
@@ -322,18 +297,14 @@ class ContractUpdateViewTestCase(TestCase):
 
 class ServiceCreateViewTestCase(TestCase):
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
 
-        self.service_name = "".join(choices(ascii_letters, k=10))
-        self.service_description = "".join(choices(ascii_letters, k=10))
+        self.service_name = random_text()
+        self.service_description = random_text()
 
         Service.objects.filter(
             name=self.service_name,
@@ -362,12 +333,9 @@ class ServiceCreateViewTestCase(TestCase):
 
 class ServiceListViewTestCase(TestCase):
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        make_services(3)
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
@@ -384,25 +352,13 @@ class ServiceListViewTestCase(TestCase):
 
 class ServiceDetailViewTestCase(TestCase):
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.service, = make_services()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
 
-        self.service = Service.objects.create(
-            name="".join(choices(ascii_letters, k=10)),
-            description="".join(choices(ascii_letters, k=10)),
-            price=22.22
-        )
-
-    def teardown(self) -> None:
-        self.service.delete()
-
     def test_get_service(self):
         response = self.client.get(
             reverse("app:service_details", kwargs={"pk": self.service.pk})
@@ -420,25 +376,13 @@ class ServiceDetailViewTestCase(TestCase):
 
 class ServiceUpdateViewTestCase(TestCase):
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.service, = make_services()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
 
-        self.service = Service.objects.create(
-            name="".join(choices(ascii_letters, k=10)),
-            description="".join(choices(ascii_letters, k=10)),
-            price=66.99
-        )
-
-    def teardown(self) -> None:
-        self.service.delete()
-
     def test_update_service(self):
         update_data = {
                 "name": "updated",
@@ -468,21 +412,17 @@ class ServiceUpdateViewTestCase(TestCase):
 
 class PotentialCreateViewTestCase(TestCase):
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
 
-        self.name = "".join(choices(ascii_letters, k=10))
-        self.surname = "".join(choices(ascii_letters, k=10))
-        self.middle_name = "".join(choices(ascii_letters, k=10))
-        self.phone_num = "".join(choices(ascii_letters, k=10))
-        self.email = "".join(choices(ascii_letters, k=10))
+        self.name = random_text()
+        self.surname = random_text()
+        self.middle_name = random_text()
+        self.phone_num = random_text()
+        self.email = random_text()
         self.advert = 1
         self.contract = 1
 
@@ -526,12 +466,8 @@ class PotentialListViewTestCase(TestCase):
     ]
 
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
@@ -539,7 +475,10 @@ class PotentialListViewTestCase(TestCase):
     def test_potential(self):
         response = self.client.get(reverse('app:potential_list'))
         self.assertQuerySetEqual(
-            Client.objects.values("pk", "name").all(),
+            Client.objects
+            .values("pk", "name", "surname", "middle_name")
+            .filter(active=False)
+            .order_by("surname", "name", "pk"),
             response.context["clients"]
         )
         self.assertTemplateUsed(response, 'app/potential_list.html')
@@ -548,26 +487,13 @@ class PotentialListViewTestCase(TestCase):
 
 class PotentialDetailViewTestCase(TestCase):
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.potential, = make_clients()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
 
-        self.potential = Client.objects.create(
-            name="".join(choices(ascii_letters, k=10)),
-            surname="".join(choices(ascii_letters, k=10)),
-            phone_num="".join(choices(ascii_letters, k=10)),
-            email="".join(choices(ascii_letters, k=10)),
-        )
-
-    def teardown(self) -> None:
-        self.potential.delete()
-
     def test_get_client(self):
         response = self.client.get(
             reverse("app:potential_details", kwargs={"pk": self.potential.pk})
@@ -585,26 +511,13 @@ class PotentialDetailViewTestCase(TestCase):
 
 class PotentialUpdateViewTestCase(TestCase):
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.potential, = make_clients()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
 
-        self.potential = Client.objects.create(
-            name="".join(choices(ascii_letters, k=10)),
-            surname="".join(choices(ascii_letters, k=10)),
-            phone_num="".join(choices(ascii_letters, k=10)),
-            email="".join(choices(ascii_letters, k=10)),
-        )
-
-    def teardown(self) -> None:
-        self.potential.delete()
-
     def test_update_potential(self):
         update_data = {
                 "name": "updated",
@@ -635,22 +548,22 @@ class PotentialUpdateViewTestCase(TestCase):
 
 
 class ActiveCreateViewTestCase(TestCase):
-    @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
+    fixtures = [
+        'contract_app_fixtures.json'
+    ]
 
     @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
 
-        self.name = "".join(choices(ascii_letters, k=10))
-        self.surname = "".join(choices(ascii_letters, k=10))
-        self.middle_name = "".join(choices(ascii_letters, k=10))
-        self.phone_num = "".join(choices(ascii_letters, k=10))
-        self.email = "".join(choices(ascii_letters, k=10))
+        self.name = random_text()
+        self.surname = random_text()
+        self.middle_name = random_text()
+        self.phone_num = random_text()
+        self.email = random_text()
         self.advert = 1
         self.contract = 1
 
@@ -694,12 +607,9 @@ class ActiveListViewTestCase(TestCase):
     ]
 
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        make_clients(3, active=True)
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
@@ -707,7 +617,10 @@ class ActiveListViewTestCase(TestCase):
     def test_active(self):
         response = self.client.get(reverse('app:active_list'))
         self.assertQuerySetEqual(
-            Client.objects.values("pk", "name").all(),
+            Client.objects
+            .values("pk", "name", "surname", "middle_name")
+            .filter(active=True)
+            .order_by("surname", "name", "pk"),
             response.context["clients"]
         )
         self.assertTemplateUsed(response, 'app/active_list.html')
@@ -716,26 +629,13 @@ class ActiveListViewTestCase(TestCase):
 
 class ActivelDetailViewTestCase(TestCase):
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.active, = make_clients()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
 
-        self.active = Client.objects.create(
-            name="".join(choices(ascii_letters, k=10)),
-            surname="".join(choices(ascii_letters, k=10)),
-            phone_num="".join(choices(ascii_letters, k=10)),
-            email="".join(choices(ascii_letters, k=10)),
-        )
-
-    def teardown(self) -> None:
-        self.active.delete()
-
     def test_get_active(self):
         response = self.client.get(
             reverse("app:active_details", kwargs={"pk": self.active.pk})
@@ -753,26 +653,13 @@ class ActivelDetailViewTestCase(TestCase):
 
 class ActiveUpdateViewTestCase(TestCase):
     @classmethod
-    def setUpClass(cls):
-        cls.user = User.objects.create_user(username="test", password="test", is_superuser=1)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.user.delete()
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.active, = make_clients()
 
     def setUp(self) -> None:
         self.client.force_login(self.user)
 
-        self.active = Client.objects.create(
-            name="".join(choices(ascii_letters, k=10)),
-            surname="".join(choices(ascii_letters, k=10)),
-            phone_num="".join(choices(ascii_letters, k=10)),
-            email="".join(choices(ascii_letters, k=10)),
-        )
-
-    def teardown(self) -> None:
-        self.active.delete()
-
     def test_update_active(self):
         update_data = {
                 "name": "updated",
@@ -800,3 +687,1300 @@ class ActiveUpdateViewTestCase(TestCase):
             )
             .exists()
         )
+
+
+class RoleCacheTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.marketer = Group.objects.create(name="marketer")
+        cls.manager = Group.objects.create(name="manager")
+        cls.user = make_user("marketer")
+        cls.user.groups.add(cls.marketer)
+
+    def setUp(self) -> None:
+        clear_roles_cache()
+        self.factory = RequestFactory()
+
+    def make_request(self):
+        request = self.factory.get("/")
+        request.user = User.objects.get(pk=self.user.pk)
+        return request
+
+    def test_roles_loaded_once(self):
+        request = self.make_request()
+        with self.assertNumQueries(1):
+            self.assertTrue(has_role(request, "marketer"))
+            self.assertFalse(has_role(request, "manager"))
+        request = self.make_request()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_roles(request), {"marketer"})
+
+    def test_membership_change_invalidates_cache(self):
+        get_user_roles(self.make_request())
+        self.user.groups.add(self.manager)
+        self.assertTrue(has_role(self.make_request(), "manager"))
+        self.manager.user_set.remove(self.user)
+        self.assertFalse(has_role(self.make_request(), "manager"))
+
+    def test_view_uses_roles(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse("app:adverts_list")).status_code, 200)
+        self.assertEqual(self.client.get(reverse("app:contracts_list")).status_code, 403)
+
+
+@override_settings(LIST_PAGE_SIZE=2)
+class KeysetPaginationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        for surname in ("Ivanov", "Petrov", "Sidorov", "Petrov", "Abramov"):
+            make_clients(surname=surname)
+
+    def setUp(self) -> None:
+        self.client.force_login(self.user)
+
+    def test_walk_pages(self):
+        expected = list(
+            Client.objects
+            .order_by("surname", "name", "pk")
+            .values_list("pk", flat=True)
+        )
+        seen = []
+        pages = []
+        url = reverse("app:potential_list")
+        response = self.client.get(url)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            page = [client["pk"] for client in response.context["clients"]]
+            pages.append((page, response.context["prev_cursor"]))
+            seen.extend(page)
+            if not response.context["next_cursor"]:
+                break
+            response = self.client.get(url, {"cursor": response.context["next_cursor"]})
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(pages), 3)
+
+        response = self.client.get(url, {"cursor": pages[-1][1]})
+        self.assertEqual([client["pk"] for client in response.context["clients"]], pages[-2][0])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("app:potential_list"), {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
+
+
+class ExplainViewsCommandTestCase(TestCase):
+    def test_no_sequential_scans(self):
+        out = StringIO()
+        call_command("explain_views", stdout=out)
+        self.assertIn("potential_list: ok", out.getvalue())
+        self.assertIn("active_details: ok", out.getvalue())
+
+    def test_does_not_write(self):
+        StatisticsSnapshot.objects.all().delete()
+        out = StringIO()
+        call_command("explain_views", stdout=out)
+        self.assertNotIn("statistics", out.getvalue())
+        self.assertIn("contracts_expiring: ok", out.getvalue())
+        self.assertFalse(StatisticsSnapshot.objects.exists())
+
+
+class StatisticsSnapshotTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.first = Advert.objects.create(name="first", channel="tv", budget=100)
+        cls.second = Advert.objects.create(name="second", channel="radio", budget=50)
+        cls.contract = Contract.objects.create(name="contract", price=30)
+
+    def setUp(self) -> None:
+        self.client.force_login(self.user)
+        rebuild_statistics()
+
+    def create_client(self, **kwargs):
+        return Client.objects.create(
+            name=random_text(),
+            surname=random_text(),
+            phone_num=random_text(),
+            email=random_text(),
+            **kwargs
+        )
+
+    def snapshot_values(self):
+        statistics = get_statistics()
+        snapshot = statistics["snapshot"]
+        statistics["adverts"] = [
+            (advert["name"], advert["client_count"], advert["converted_count"], advert["revenue"])
+            for advert in statistics["adverts"]
+        ]
+        return (
+            list(statistics["adverts"]),
+            snapshot.active_clients,
+            snapshot.advert_budget,
+            snapshot.contract_revenue,
+        )
+
+    def test_incremental_matches_rebuild(self):
+        client = self.create_client(advert=self.first)
+        self.create_client(advert=self.first, active=True, contract=self.contract)
+        client.advert = self.second
+        client.active = True
+        client.save()
+        client.contract = self.contract
+        client.save()
+        self.create_client(advert=self.second, contract=self.contract).delete()
+        self.first.budget = 150
+        self.first.save()
+        Advert.objects.create(name="third", channel="web", budget=10).delete()
+        Contract.objects.create(name="other", price=20)
+        self.contract.price = 40
+        self.contract.save()
+
+        incremental = self.snapshot_values()
+        rebuild_statistics()
+        self.assertEqual(incremental, self.snapshot_values())
+        self.assertEqual(incremental[1], 2)
+        self.assertEqual(incremental[3], 60)
+        self.assertEqual(incremental[0][0], ("first", 1, 1, 40))
+
+    def test_compute_statistics_single_query(self):
+        self.create_client(advert=self.first, active=True, contract=self.contract)
+        self.create_client(advert=self.first)
+        self.create_client(active=True)
+        with self.assertNumQueries(1):
+            totals, adverts = compute_statistics()
+        self.assertEqual(totals["active_clients"], 2)
+        self.assertEqual(totals["advert_budget"], 150)
+        self.assertEqual(totals["contract_revenue"], 30)
+        first = next(advert for advert in adverts if advert.advert_id == self.first.pk)
+        self.assertEqual(first.revenue, 30)
+
+    def test_cost_per_acquisition(self):
+        self.create_client(advert=self.first, active=True)
+        self.create_client(advert=self.first, active=True)
+        adverts = {advert["name"]: advert for advert in get_statistics()["adverts"]}
+        self.assertEqual(adverts["first"]["cost_per_acquisition"], 50)
+        self.assertIsNone(adverts["second"]["cost_per_acquisition"])
+
+    def test_snapshot_created_on_first_read(self):
+        StatisticsSnapshot.objects.all().delete()
+        self.create_client(advert=self.first, active=True)
+        self.assertEqual(get_statistics()["snapshot"].active_clients, 1)
+
+    def test_statistics_view(self):
+        self.create_client(advert=self.first, active=True)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("app:statistics"))
+        self.assertContains(response, "first")
+        self.assertEqual(response.context["adverts"]["snapshot"].advert_budget, 150)
+
+
+class AdvertCountersTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.first, cls.second = make_adverts(2)
+
+    def create_client(self, **kwargs):
+        return Client.objects.create(name="name", surname="surname", phone_num="phone", email="email", **kwargs)
+
+    def counters(self, advert):
+        advert.refresh_from_db()
+        return advert.client_count, advert.active_client_count
+
+    def test_signals_keep_counters(self):
+        client = self.create_client(advert=self.first)
+        self.create_client(advert=self.first, active=True)
+        self.assertEqual(self.counters(self.first), (2, 1))
+        client.active = True
+        client.save()
+        self.assertEqual(self.counters(self.first), (2, 2))
+        client.advert = self.second
+        client.save()
+        self.assertEqual(self.counters(self.first), (1, 1))
+        self.assertEqual(self.counters(self.second), (1, 1))
+        client.delete()
+        self.assertEqual(self.counters(self.second), (0, 0))
+        self.assertEqual(recount_adverts(), 0)
+
+    def test_promotion_counts(self):
+        self.create_client(advert=self.first)
+        self.create_client(advert=self.first)
+        promote_clients(Client.objects.all())
+        self.assertEqual(self.counters(self.first), (2, 2))
+
+    def test_single_and_bulk_promotion_count_once(self):
+        user = make_superuser()
+        user.groups.add(Group.objects.create(name="manager"))
+        self.client.force_login(user)
+        rebuild_statistics()
+        first = self.create_client(advert=self.first)
+        second = self.create_client(advert=self.first)
+
+        self.assertEqual(promote_clients(Client.objects.filter(pk=first.pk)), 1)
+        response = self.client.post(reverse("app:confirm_active", kwargs={"pk": first.pk}), {"active": "on"})
+        self.assertEqual(response.status_code, 302)
+        response = self.client.post(reverse("app:confirm_active", kwargs={"pk": second.pk}), {"active": "on"})
+        self.assertEqual(promote_clients(Client.objects.filter(pk=second.pk)), 0)
+
+        self.assertEqual(self.counters(self.first), (2, 2))
+        self.assertEqual(get_statistics()["snapshot"].active_clients, 2)
+        self.assertEqual(recount_adverts(), 0)
+
+    def test_concurrent_promotion_recorded_once(self):
+        first = self.create_client(advert=self.first)
+        second = self.create_client(advert=self.first)
+        raced = []
+
+        def promote_first(execute, sql, params, many, context):
+            # Another request promotes the first client between the locking
+            # SELECT and the UPDATE.
+            if not raced and sql.startswith('UPDATE "app_client"'):
+                raced.append(sql)
+                Client.objects.filter(pk=first.pk).update(active=True)
+            return execute(sql, params, many, context)
+
+        with self.captureOnCommitCallbacks(execute=True), connection.execute_wrapper(promote_first):
+            self.assertEqual(promote_clients(Client.objects.filter(pk__in=[first.pk, second.pk])), 1)
+        self.assertEqual(
+            list(ClientEvent.objects.filter(kind=ClientEvent.PROMOTED).values_list("client_id", flat=True)),
+            [second.pk],
+        )
+        # The concurrent promotion counts the first client itself.
+        self.assertEqual(self.counters(self.first), (2, 1))
+
+    def test_advert_save_keeps_counters(self):
+        advert = Advert.objects.get(pk=self.first.pk)
+        self.create_client(advert=self.first)
+        advert.name = "renamed"
+        advert.save()
+        self.assertEqual(self.counters(self.first), (1, 0))
+        self.assertEqual(self.first.name, "renamed")
+
+    def test_recount_command(self):
+        self.create_client(advert=self.first, active=True)
+        Advert.objects.update(client_count=5, active_client_count=0)
+        out = StringIO()
+        call_command("recount_adverts", stdout=out)
+        self.assertIn("2 fixed", out.getvalue())
+        self.assertEqual(self.counters(self.first), (1, 1))
+        self.assertEqual(self.counters(self.second), (0, 0))
+
+
+class QueryBudgetTestCase(TestCase):
+    # Every route in app/urls.py declares query_budget on its view: the number
+    # of queries a GET may run, session lookups included. Users with a role
+    # are checked with a cold role cache, which adds the groups lookup.
+
+    @classmethod
+    def setUpClass(cls):
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.enterClassContext(tempfile.TemporaryDirectory())))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.staff = make_user("staff")
+        cls.staff.groups.add(*(Group.objects.create(name=name) for name in ("operator", "manager", "marketer")))
+        advert = Advert.objects.create(name="advert", channel="channel")
+        contract = Contract.objects.create(name="contract", document=SimpleUploadedFile("contract.pdf", b"%PDF"))
+        service = Service.objects.create(name="service", price=10)
+        client = Client.objects.create(
+            name="name",
+            surname="surname",
+            phone_num="phone",
+            email="email",
+            advert=advert,
+            contract=contract,
+        )
+        # The client history is looked up by the client's primary key.
+        cls.objects = {Advert: advert, Contract: contract, Service: service, Client: client, ClientEvent: client}
+        rebuild_statistics()
+
+    def assertWithinBudget(self, user):
+        self.client.force_login(user)
+        for pattern in urlpatterns:
+            view_class = pattern.callback.view_class
+            # Views without roles are for superusers only.
+            if not user.is_superuser and not getattr(view_class, "allowed_roles", True):
+                continue
+            with self.subTest(pattern.name, user=user.username):
+                self.assertTrue(
+                    hasattr(view_class, "query_budget"),
+                    f"{view_class.__name__} does not declare query_budget",
+                )
+                kwargs = {}
+                if "pk" in pattern.pattern.converters:
+                    kwargs["pk"] = self.objects[view_class.model or view_class.queryset.model].pk
+                clear_roles_cache()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(reverse(f"app:{pattern.name}", kwargs=kwargs))
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(
+                    len(queries),
+                    view_class.query_budget,
+                    "\n".join(query["sql"] for query in queries),
+                )
+
+    def test_views_within_query_budget(self):
+        self.assertWithinBudget(self.user)
+
+    def test_views_within_query_budget_for_roles(self):
+        self.assertWithinBudget(self.staff)
+
+
+class RequestMetricsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.operator = make_user("operator")
+
+    def setUp(self) -> None:
+        metrics.clear()
+        self.client.force_login(self.user)
+
+    def test_metrics_recorded(self):
+        Advert.objects.create(name="advert", channel="channel")
+        self.client.get(reverse("app:adverts_list"))
+        response = self.client.get(reverse("app:metrics"))
+        self.assertEqual(response.status_code, 200)
+        route = response.json()["app:adverts_list"]
+        self.assertEqual(route["requests"], 1)
+        self.assertEqual(route["over_budget"], 0)
+        self.assertEqual(route["queries"]["sum"], 4)
+        self.assertGreater(route["render_time"]["sum"], 0)
+
+    def test_prometheus_format(self):
+        self.client.get(reverse("app:statistics"))
+        response = self.client.get(reverse("app:metrics"), {"format": "prometheus"})
+        self.assertContains(response, 'crm_request_duration_seconds_bucket{route="app:statistics",le="+Inf"} 1')
+        self.assertContains(response, 'crm_request_queries_count{route="app:statistics"} 1')
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_sampling_disabled(self):
+        self.client.get(reverse("app:statistics"))
+        self.assertEqual(metrics.summarize(), {})
+
+    def test_admin_only(self):
+        self.client.force_login(self.operator)
+        self.assertEqual(self.client.get(reverse("app:metrics")).status_code, 403)
+
+
+@override_settings(
+    SENTRY_TRACES_SAMPLE_RATE=0.5,
+    SENTRY_HEAVY_TRACES_SAMPLE_RATE=0.3,
+    SENTRY_AUTH_TRACES_SAMPLE_RATE=0.1,
+)
+class SentrySamplerTestCase(TestCase):
+    def sample(self, path):
+        return traces_sampler({"wsgi_environ": {"PATH_INFO": path}})
+
+    def test_route_rates(self):
+        self.assertEqual(self.sample(reverse("app:statistics")), 0.3)
+        self.assertEqual(self.sample(reverse("app:active_list")), 0.3)
+        self.assertEqual(self.sample(reverse("myauth:login")), 0.1)
+        self.assertEqual(self.sample(reverse("app:active_details", kwargs={"pk": 1})), 0.5)
+
+    def test_static_and_unknown_dropped(self):
+        self.assertEqual(self.sample("/static/app.css"), 0)
+        self.assertEqual(self.sample("/favicon.ico"), 0)
+        self.assertEqual(self.sample("/missing/"), 0)
+
+    def test_parent_decision_kept(self):
+        self.assertEqual(traces_sampler({"parent_sampled": True}), 1.0)
+        self.assertEqual(traces_sampler({"asgi_scope": {"path": reverse("app:statistics")}}), 0.3)
+
+
+class FragmentCacheTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.advert = Advert.objects.create(name="first advert", channel="channel")
+
+    def setUp(self) -> None:
+        fragment_cache().clear()
+        self.client.force_login(self.user)
+
+    def test_unchanged_list_served_from_cache(self):
+        url = reverse("app:adverts_list")
+        self.client.get(url)
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, "first advert")
+        self.assertTemplateNotUsed(response, "app/advert_rows.html")
+
+    def test_write_invalidates_cache(self):
+        url = reverse("app:adverts_list")
+        self.client.get(url)
+        Advert.objects.create(name="second advert", channel="channel")
+        self.assertContains(self.client.get(url), "second advert")
+        self.advert.delete()
+        self.assertNotContains(self.client.get(url), "first advert")
+
+
+class ConditionalGetTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.advert = Advert.objects.create(name="advert", channel="channel")
+        cls.active = Client.objects.create(
+            name=random_text(),
+            surname=random_text(),
+            phone_num=random_text(),
+            email=random_text(),
+            advert=cls.advert,
+            active=True,
+        )
+
+    def setUp(self) -> None:
+        self.client.force_login(self.user)
+
+    def test_detail_not_modified(self):
+        url = reverse("app:active_details", kwargs={"pk": self.active.pk})
+        response = self.client.get(url)
+        self.assertTrue(response.has_header("Last-Modified"))
+        etag = response.headers["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_related_change_invalidates_detail(self):
+        url = reverse("app:active_details", kwargs={"pk": self.active.pk})
+        etag = self.client.get(url).headers["ETag"]
+        self.advert.name = "renamed"
+        self.advert.save()
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "renamed")
+
+    def test_list_etag_tracks_rows(self):
+        url = reverse("app:adverts_list")
+        etag = self.client.get(url).headers["ETag"]
+        self.assertEqual(self.client.get(url, headers={"if-none-match": etag}).status_code, 304)
+        Advert.objects.create(name="another", channel="channel")
+        self.assertEqual(self.client.get(url, headers={"if-none-match": etag}).status_code, 200)
+
+
+class ClientImportTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.tv = Advert.objects.create(name="Весна", channel="tv", budget=100)
+        cls.radio = Advert.objects.create(name="radio", channel="Лето", budget=50)
+
+    def setUp(self) -> None:
+        self.client.force_login(self.user)
+        rebuild_statistics()
+
+    def make_csv(self):
+        rows = [
+            "name,surname,middle_name,phone_num,email,advert",
+            "Иван,Иванов,,+7 900 000-00-01,ivan@example.com,весна",
+            "Пётр,Петров,Петрович,+7 900 000-00-02,petr@example.com,TV",
+            "Анна,,,+7 900 000-00-03,anna@example.com,",
+            "Олег,Олегов,,+7 900 000-00-04,oleg@example.com,nowhere",
+            "Мария,Маринина,,+7 900 000-00-05,maria@example.com,лето",
+        ]
+        return ("\n".join(rows) + "\n").encode("utf-8-sig")
+
+    def test_command_imports_in_batches(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "clients.csv")
+            with open(path, "wb") as source:
+                source.write(self.make_csv())
+            call_command("import_clients", path, batch_size=2, stdout=StringIO())
+
+            with open(path + ".errors.csv", encoding="utf-8") as errors:
+                rejected = list(csv.DictReader(errors))
+
+        self.assertEqual([row["line"] for row in rejected], ["4", "5"])
+        self.assertIn("surname", rejected[0]["errors"])
+        self.assertIn("nowhere", rejected[1]["errors"])
+        self.assertEqual(
+            sorted(Client.objects.values_list("surname", "advert__name", "middle_name", "active")),
+            [
+                ("Иванов", "Весна", None, False),
+                ("Маринина", "radio", None, False),
+                ("Петров", "Весна", "Петрович", False),
+            ],
+        )
+        statistics = get_statistics()
+        self.assertEqual(
+            {advert["name"]: advert["client_count"] for advert in statistics["adverts"]},
+            {"Весна": 2, "radio": 1},
+        )
+
+    def test_view_reports_rejected_rows(self):
+        upload = SimpleUploadedFile("clients.csv", self.make_csv(), content_type="text/csv")
+        response = self.client.post(reverse("app:potential_import"), {"file": upload, "active": "on"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["result"].imported, 3)
+        self.assertEqual(response.context["result"].rejected, 2)
+        self.assertEqual(len(response.context["errors"]), 2)
+        self.assertEqual(Client.objects.filter(active=True).count(), 3)
+        self.assertEqual(get_statistics()["snapshot"].active_clients, 3)
+
+    def test_events_bypass_request_buffer(self):
+        rows = iter_csv_rows(BytesIO(self.make_csv()))
+        with buffered_events() as buffer, self.captureOnCommitCallbacks(execute=True) as callbacks:
+            import_clients(rows, batch_size=2)
+        self.assertEqual(buffer, [])
+        self.assertEqual(len(callbacks), 2)
+        self.assertEqual(ClientEvent.objects.filter(kind=ClientEvent.CREATED).count(), 3)
+
+
+@override_settings(EXPORT_BUFFER_SIZE=64, EXPORT_CHUNK_SIZE=2)
+class ExportTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.advert = Advert.objects.create(name="advert", channel="channel", budget=100)
+        cls.contract = Contract.objects.create(name="contract", price=30)
+        for i in range(5):
+            Client.objects.create(
+                name=f"name{i}",
+                surname=f"surname{i}",
+                phone_num="phone",
+                email="email",
+                advert=cls.advert,
+                active=i % 2 == 0,
+                contract=cls.contract if i % 2 == 0 else None,
+            )
+
+    def setUp(self) -> None:
+        self.client.force_login(self.user)
+
+    def export(self, name, **params):
+        response = self.client.get(reverse(f"app:{name}"), params)
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment;", response.headers["Content-Disposition"])
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_matches_list_filter(self):
+        rows = list(csv.reader(StringIO(self.export("potential_export"))))
+        self.assertEqual(rows[0], ["id", "surname", "name", "middle_name", "phone_num", "email", "advert__name"])
+        self.assertEqual([row[1] for row in rows[1:]], ["surname1", "surname3"])
+
+    def test_json(self):
+        rows = json.loads(self.export("active_export", format="json"))
+        self.assertEqual([row["surname"] for row in rows], ["surname0", "surname2", "surname4"])
+        self.assertEqual({row["contract__name"] for row in rows}, {"contract"})
+
+    def test_statistics(self):
+        rebuild_statistics()
+        rows = json.loads(self.export("statistics_export", format="json"))
+        self.assertEqual(
+            [(row["name"], row["client_count"], row["converted_count"], row["revenue"]) for row in rows],
+            [("advert", 5, 3, "90.00")],
+        )
+
+    def test_empty_json(self):
+        Client.objects.filter(active=False).delete()
+        self.assertEqual(json.loads(self.export("potential_export", format="json")), [])
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse("app:contracts_export"), {"format": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ClientSearchTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.ivanov = Client.objects.create(
+            name="Petr", surname="Ivanov", phone_num="+7 (900) 123-45-67", email="petr@example.com",
+        )
+        cls.petrova = Client.objects.create(
+            name="Anna", surname="Petrova", phone_num="8-900-765-43-21", email="anna@example.com", active=True,
+        )
+
+    def setUp(self) -> None:
+        self.client.force_login(self.user)
+
+    def surnames(self, term, **kwargs):
+        return [client["surname"] for client in search_clients(term, **kwargs)]
+
+    def test_phone_digits(self):
+        self.assertEqual(Client.objects.get(pk=self.ivanov.pk).phone_digits, "79001234567")
+        self.assertEqual(self.surnames("123 45"), ["Ivanov"])
+        self.assertEqual(self.surnames("900"), ["Ivanov", "Petrova"])
+
+    def test_surname_prefix_ranked_first(self):
+        self.assertEqual(self.surnames("petr"), ["Petrova", "Ivanov"])
+        self.assertEqual(self.surnames("petr", active=False), ["Ivanov"])
+        self.assertEqual(self.surnames("ivan pet"), ["Ivanov"])
+
+    def test_short_term(self):
+        self.assertEqual(self.surnames("p"), [])
+
+    def test_cyrillic_case(self):
+        Client.objects.create(name="Иван", surname="Иванов", phone_num="phone", email="ivan@example.com")
+        self.assertEqual(self.surnames("ив"), ["Иванов"])
+        self.assertEqual(self.surnames("ИВАНОВ иван"), ["Иванов"])
+
+    def test_view(self):
+        response = self.client.get(reverse("app:client_search"), {"q": "Petrova", "active": "1"})
+        results = response.json()["results"]
+        self.assertEqual([result["pk"] for result in results], [self.petrova.pk])
+        self.assertEqual(results[0]["url"], reverse("app:active_details", kwargs={"pk": self.petrova.pk}))
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command("benchmark_search", terms=4, repeat=1, target_ms=10000, stdout=out)
+        self.assertIn("p95", out.getvalue())
+
+
+@override_settings(ROOT_URLCONF="crm.async_urls")
+class AsyncViewsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.manager = make_user("manager")
+        cls.manager.groups.add(Group.objects.create(name="manager"))
+        cls.advert = Advert.objects.create(name="advert", channel="channel", budget=100)
+        cls.contract = Contract.objects.create(name="contract", price=30)
+        cls.service = Service.objects.create(name="service", price=10)
+        cls.potential = Client.objects.create(
+            name="Petr", surname="Ivanov", phone_num="phone", email="email", advert=cls.advert,
+        )
+        cls.active = Client.objects.create(
+            name="Anna", surname="Petrova", phone_num="phone", email="email",
+            advert=cls.advert, contract=cls.contract, active=True,
+        )
+        cls.objects = {
+            "advert_details": cls.advert,
+            "contract_details": cls.contract,
+            "service_details": cls.service,
+            "potential_details": cls.potential,
+            "active_details": cls.active,
+        }
+
+    def setUp(self) -> None:
+        clear_roles_cache()
+        fragment_cache().clear()
+
+    async def test_async_routes(self):
+        await self.async_client.aforce_login(self.user)
+        routes = [pattern for pattern in urlpatterns if pattern.callback.view_class in ASYNC_VARIANTS]
+        self.assertEqual(len(routes), len(ASYNC_VARIANTS))
+        for pattern in routes:
+            with self.subTest(pattern.name):
+                kwargs = {"pk": self.objects[pattern.name].pk} if pattern.name in self.objects else {}
+                response = await self.async_client.get(reverse(f"app:{pattern.name}", kwargs=kwargs))
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(ASYNC_VARIANTS[pattern.callback.view_class], type(response.context["view"]).__mro__)
+
+    async def test_list_matches_sync_view(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("app:active_list"))
+        self.assertContains(response, "Petrova")
+        self.assertNotContains(response, "Ivanov")
+        etag = response.headers["ETag"]
+        response = await self.async_client.get(reverse("app:active_list"), headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_detail_not_found(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("app:advert_details", kwargs={"pk": 0}))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_role_check(self):
+        url = reverse("app:potential_list")
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+        await self.async_client.aforce_login(self.manager)
+        self.assertEqual((await self.async_client.get(url)).status_code, 200)
+        self.assertEqual((await self.async_client.get(reverse("app:adverts_list"))).status_code, 403)
+
+    async def test_statistics(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("app:statistics"))
+        self.assertIs(response.resolver_match.func.view_class, AsyncStatisticsView)
+        self.assertEqual(response.context["adverts"]["adverts"][0]["client_count"], 2)
+        self.assertEqual(response.context["adverts"]["snapshot"].contract_revenue, 30)
+
+    async def test_aget_statistics_matches_sync(self):
+        await StatisticsSnapshot.objects.all().adelete()
+        statistics = await aget_statistics()
+        self.assertEqual(statistics["snapshot"].contract_revenue, 30)
+        expected = await sync_to_async(lambda: list(get_statistics()["adverts"]))()
+        self.assertEqual(statistics["adverts"], expected)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTestCase(TestCase):
+    # "replica" shares the default connection, like a replica with no lag,
+    # so routing can be checked inside the test transaction.
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.advert = Advert.objects.create(name="advert", channel="channel")
+        rebuild_statistics()
+
+    def setUp(self) -> None:
+        connections["replica"] = connections["default"]
+        self.addCleanup(connections.__delitem__, "replica")
+        self.client.force_login(self.user)
+
+    def test_reads_outside_views_use_primary(self):
+        self.assertEqual(router.db_for_read(Advert), "default")
+        self.assertEqual(router.db_for_write(Advert), "default")
+
+    def test_detail_and_statistics_read_from_replica(self):
+        response = self.client.get(reverse("app:advert_details", kwargs={"pk": self.advert.pk}))
+        self.assertEqual(response.context["advert"]._state.db, "replica")
+        response = self.client.get(reverse("app:statistics"))
+        self.assertEqual(response.context["adverts"]["snapshot"]._state.db, "replica")
+        self.assertEqual(router.db_for_read(Advert), "default")
+
+    def test_form_reads_use_primary(self):
+        response = self.client.get(reverse("app:update_advert", kwargs={"pk": self.advert.pk}))
+        self.assertEqual(response.context["object"]._state.db, "default")
+
+    def test_read_your_writes(self):
+        url = reverse("app:update_advert", kwargs={"pk": self.advert.pk})
+        response = self.client.post(url, {"name": "renamed", "description": ""})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("crm_primary", response.cookies)
+
+        response = self.client.get(reverse("app:advert_details", kwargs={"pk": self.advert.pk}))
+        self.assertEqual(response.context["advert"]._state.db, "default")
+        self.assertEqual(response.context["advert"].name, "renamed")
+
+        self.client.cookies.pop("crm_primary")
+        response = self.client.get(reverse("app:advert_details", kwargs={"pk": self.advert.pk}))
+        self.assertEqual(response.context["advert"]._state.db, "replica")
+
+    def test_list_fragments_ignore_lagging_replica(self):
+        # A separate database that has not received the rename yet.
+        replica = load_backend("django.db.backends.sqlite3").DatabaseWrapper(
+            {**connections["default"].settings_dict, "ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:", "OPTIONS": {}},
+            alias="replica",
+        )
+        connections["replica"] = replica
+        self.addCleanup(replica.close)
+        with replica.schema_editor() as editor:
+            editor.create_model(Advert)
+        Advert.objects.using("replica").bulk_create([Advert(pk=self.advert.pk, name="stale", channel="channel")])
+
+        self.advert.name = "renamed"
+        self.advert.save()
+        for _ in range(2):
+            response = self.client.get(reverse("app:adverts_list"))
+            self.assertIn("renamed", response.context["rows_html"])
+            self.assertNotIn("stale", response.context["rows_html"])
+
+
+class ClientPromotionTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_superuser(is_staff=True)
+        cls.first = Advert.objects.create(name="first", channel="tv", budget=100)
+        cls.second = Advert.objects.create(name="second", channel="radio", budget=50)
+        cls.clients = [
+            Client.objects.create(
+                name=f"name{i}",
+                surname=f"surname{i}",
+                phone_num="phone",
+                email="email",
+                advert=cls.first if i < 3 else cls.second,
+            )
+            for i in range(5)
+        ]
+
+    def setUp(self) -> None:
+        self.client.force_login(self.user)
+        rebuild_statistics()
+
+    def statistics_values(self):
+        statistics = get_statistics()
+        return (
+            statistics["snapshot"].active_clients,
+            [(advert["name"], advert["client_count"], advert["converted_count"]) for advert in statistics["adverts"]],
+        )
+
+    def assertStatisticsConsistent(self):
+        incremental = self.statistics_values()
+        rebuild_statistics()
+        self.assertEqual(incremental, self.statistics_values())
+
+    def test_promote_by_ids(self):
+        ids = [self.clients[0].pk, self.clients[3].pk]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("app:promote_clients"), {"ids": ids})
+        self.assertRedirects(response, reverse("app:potential_list"), fetch_redirect_response=False)
+        self.assertEqual(sorted(Client.objects.filter(active=True).values_list("pk", flat=True)), sorted(ids))
+        updates = [query["sql"] for query in queries if query["sql"].startswith('UPDATE "app_client"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.statistics_values()[0], 2)
+        self.assertStatisticsConsistent()
+
+    def test_promote_by_advert(self):
+        self.client.post(reverse("app:promote_clients"), {"ids": [self.clients[0].pk]})
+        self.client.post(reverse("app:promote_clients"), {"advert": self.first.pk})
+        self.assertEqual(
+            sorted(Client.objects.filter(active=True).values_list("advert__name", flat=True)),
+            ["first", "first", "first"],
+        )
+        self.assertStatisticsConsistent()
+
+    def test_requires_selection(self):
+        response = self.client.post(reverse("app:promote_clients"), {})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Client.objects.filter(active=True).exists())
+
+    def test_admin_action(self):
+        response = self.client.post(
+            reverse("admin:app_client_changelist"),
+            {"action": "promote", "_selected_action": [client.pk for client in self.clients[3:]]},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Client.objects.filter(active=True).count(), 2)
+        self.assertStatisticsConsistent()
+
+    def test_single_promotion_updates_two_columns(self):
+        client = self.clients[1]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse("app:confirm_active", kwargs={"pk": client.pk}), {"active": "on"})
+        update = next(query["sql"] for query in queries if query["sql"].startswith('UPDATE "app_client"'))
+        self.assertNotIn('"surname"', update)
+        self.assertTrue(Client.objects.get(pk=client.pk).active)
+        self.assertStatisticsConsistent()
+
+
+class ClientHistoryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.advert = Advert.objects.create(name="advert", channel="channel")
+        cls.contract = Contract.objects.create(name="contract")
+
+    def setUp(self) -> None:
+        self.client.force_login(self.user)
+
+    def create_client(self, **kwargs):
+        return Client.objects.create(name="name", surname="surname", phone_num="phone", email="email", **kwargs)
+
+    def kinds(self, client_id):
+        return list(ClientEvent.objects.filter(client_id=client_id).order_by("pk").values_list("kind", flat=True))
+
+    def test_lifecycle(self):
+        data = {"name": "name", "surname": "surname", "phone_num": "phone", "email": "email", "advert": self.advert.pk}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("app:potential_create"), data)
+        client = Client.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("app:update_potential", kwargs={"pk": client.pk}), dict(data, surname="other"))
+            self.client.post(reverse("app:confirm_active", kwargs={"pk": client.pk}), {"active": "on"})
+            self.client.post(
+                reverse("app:update_active", kwargs={"pk": client.pk}),
+                dict(data, surname="other", active="on", contract=self.contract.pk),
+            )
+            self.client.post(reverse("app:delete_client", kwargs={"pk": client.pk}))
+
+        self.assertEqual(self.kinds(client.pk), ["created", "updated", "promoted", "contract_attached", "deleted"])
+        updated = ClientEvent.objects.get(kind="updated")
+        self.assertEqual(updated.changes, {"surname": ["surname", "other"]})
+        self.assertEqual(updated.actor_id, self.user.pk)
+        response = self.client.get(reverse("app:client_history", kwargs={"pk": client.pk}))
+        self.assertContains(response, "Прикреплён контракт")
+
+    def test_request_events_written_at_once(self):
+        clients = [self.create_client() for _ in range(3)]
+        ClientEvent.objects.all().delete()
+        with CaptureQueriesContext(connection) as queries, buffered_events():
+            with self.captureOnCommitCallbacks(execute=True):
+                promote_clients(Client.objects.all())
+        inserts = [query for query in queries if query["sql"].startswith('INSERT INTO "app_clientevent"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(sorted(ClientEvent.objects.values_list("client_id", flat=True)), [c.pk for c in clients])
+
+    def test_rolled_back_changes_are_not_recorded(self):
+        client = self.create_client()
+        with buffered_events() as buffer:
+            try:
+                with transaction.atomic():
+                    client.surname = "other"
+                    client.save()
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(buffer, [])
+
+    @override_settings(LIST_PAGE_SIZE=2)
+    def test_timeline_newest_first(self):
+        client = self.create_client()
+        ClientEvent.objects.bulk_create(
+            ClientEvent(client_id=client.pk, kind="updated", changes={"email": [str(i), str(i + 1)]})
+            for i in range(5)
+        )
+        url = reverse("app:client_history", kwargs={"pk": client.pk})
+        pages = []
+        response = self.client.get(url)
+        while True:
+            pages.append([event.pk for event in response.context["events"]])
+            if not response.context["next_cursor"]:
+                break
+            response = self.client.get(url, {"cursor": response.context["next_cursor"]})
+        ids = [pk for page in pages for pk in page]
+        self.assertEqual(ids, sorted(ClientEvent.objects.filter(client_id=client.pk).values_list("pk", flat=True), reverse=True))
+        previous = self.client.get(url, {"cursor": response.context["prev_cursor"]})
+        self.assertEqual([event.pk for event in previous.context["events"]], pages[-2])
+
+
+class ContractDocumentTestCase(TestCase):
+    content = b"%PDF-1.4 contract document"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media_root))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+
+    def setUp(self) -> None:
+        self.client.force_login(self.user)
+
+    def upload(self, filename, content=None):
+        self.client.post(
+            reverse("app:create_contract"),
+            {
+                "name": filename,
+                "document": SimpleUploadedFile(filename, content or self.content),
+                "created_at": "2024-12-23",
+                "validity_period": 20,
+                "price": 10,
+            },
+        )
+        return Contract.objects.get(name=filename)
+
+    def download(self, contract, **headers):
+        return self.client.get(reverse("app:contract_document", kwargs={"pk": contract.pk}), headers=headers)
+
+    def test_identical_documents_stored_once(self):
+        first = self.upload("first.pdf")
+        second = self.upload("second.PDF")
+        other = self.upload("other.pdf", b"%PDF-1.4 another document")
+        self.assertEqual(first.document.name, second.document.name)
+        self.assertNotEqual(first.document.name, other.document.name)
+        self.assertIn(hashlib.sha256(self.content).hexdigest(), first.document.name)
+        self.assertEqual(second.document_name, "second.PDF")
+        stored = [name for _, _, files in os.walk(self.media_root) for name in files]
+        self.assertEqual(len(stored), 2)
+
+    def test_download(self):
+        contract = self.upload("договор.pdf")
+        response = self.download(contract)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertEqual(response.headers["Content-Type"], "application/pdf")
+        self.assertIn("attachment", response.headers["Content-Disposition"])
+        self.assertEqual(response.headers["Accept-Ranges"], "bytes")
+
+    def test_range_requests(self):
+        contract = self.upload("contract.pdf")
+        response = self.download(contract, range="bytes=2-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), self.content[2:6])
+        self.assertEqual(response.headers["Content-Range"], f"bytes 2-5/{len(self.content)}")
+        self.assertEqual(response.headers["Content-Length"], "4")
+
+        response = self.download(contract, range="bytes=-3")
+        self.assertEqual(b"".join(response.streaming_content), self.content[-3:])
+
+        response = self.download(contract, range=f"bytes={len(self.content)}-")
+        self.assertEqual(response.status_code, 416)
+
+        response = self.download(contract, range="bytes=2-5", if_range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+
+    @override_settings(DOCUMENT_ACCEL_REDIRECT="/protected-documents/")
+    def test_accel_redirect(self):
+        contract = self.upload("contract.pdf")
+        response = self.download(contract)
+        self.assertEqual(response.headers["X-Accel-Redirect"], "/protected-documents/" + contract.document.name)
+        self.assertEqual(response.content, b"")
+
+    def test_contract_without_document(self):
+        contract = Contract.objects.create(name="contract")
+        self.assertEqual(self.download(contract).status_code, 404)
+
+    def test_move_documents_from_old_root(self):
+        make_contracts(2, document="contracts/documents/old.pdf")
+        make_contracts(document="contracts/documents/lost.pdf")
+        with tempfile.TemporaryDirectory() as source:
+            os.makedirs(os.path.join(source, "contracts", "documents"))
+            with open(os.path.join(source, "contracts", "documents", "old.pdf"), "wb") as old:
+                old.write(self.content)
+            out, err = StringIO(), StringIO()
+            call_command("move_documents", source=source, stdout=out, stderr=err)
+            self.assertFalse(os.path.exists(os.path.join(source, "contracts", "documents", "old.pdf")))
+        with open(os.path.join(self.media_root, "contracts", "documents", "old.pdf"), "rb") as moved:
+            self.assertEqual(moved.read(), self.content)
+        self.assertIn(": 1, not found: 1", out.getvalue())
+        self.assertIn("lost.pdf", err.getvalue())
+
+
+@override_settings(CONTRACT_EXPIRY_DAYS=30)
+class ContractExpiryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        now = timezone.now()
+        # Started 100 days ago; they ran out 10 days ago, expire in 5 and 20 days and in a year.
+        cls.contracts = {
+            days: Contract.objects.create(name=f"contract{days}", created_at=now - timedelta(days=100), validity_period=days)
+            for days in (90, 105, 120, 465)
+        }
+        cls.clients = {
+            days: Client.objects.create(name="name", surname="surname", phone_num="phone", email="email", contract=contract)
+            for days, contract in cls.contracts.items()
+        }
+
+    def setUp(self) -> None:
+        self.client.force_login(self.user)
+
+    def test_expires_at_maintained_on_save(self):
+        contract = self.contracts[90]
+        self.assertEqual(contract.expires_at, contract.created_at + timedelta(days=90))
+        contract.validity_period = 200
+        contract.save(update_fields=["validity_period"])
+        contract.refresh_from_db()
+        self.assertEqual(contract.expires_at, contract.created_at + timedelta(days=200))
+
+    def test_expiring_list(self):
+        response = self.client.get(reverse("app:contracts_expiring"))
+        self.assertEqual(
+            [contract["name"] for contract in response.context["contracts"]],
+            ["contract105", "contract120"],
+        )
+
+    def test_scan_marks_and_unmarks_clients(self):
+        call_command("scan_contract_expiry", stdout=StringIO())
+        self.assertEqual(
+            sorted(Client.objects.filter(contract_expiring=True).values_list("contract__validity_period", flat=True)),
+            [90, 105, 120],
+        )
+        renewed = self.contracts[105]
+        renewed.validity_period = 465
+        renewed.save()
+        out = StringIO()
+        call_command("scan_contract_expiry", stdout=out)
+        self.assertIn("marked 0 clients, unmarked 1", out.getvalue())
+        self.assertFalse(Client.objects.get(pk=self.clients[105].pk).contract_expiring)
+
+    def test_incremental_scan_reads_new_window_only(self):
+        mark_expiring_clients()
+        # Unflagged behind the scan's back: an incremental run does not
+        # revisit contracts that expired before its window.
+        Client.objects.filter(pk=self.clients[90].pk).update(contract_expiring=False)
+        self.assertEqual(mark_expiring_clients(now=timezone.now() + timedelta(days=340)), (1, 0))
+        self.assertTrue(Client.objects.get(pk=self.clients[465].pk).contract_expiring)
+        self.assertFalse(Client.objects.get(pk=self.clients[90].pk).contract_expiring)
+        self.assertEqual(mark_expiring_clients(full=True), (1, 1))
+        self.assertTrue(Client.objects.get(pk=self.clients[90].pk).contract_expiring)
+
+    def test_client_flagged_when_contract_changes(self):
+        client = Client.objects.get(pk=self.clients[465].pk)
+        self.assertFalse(client.contract_expiring)
+        client.contract = self.contracts[105]
+        client.save(update_fields=["contract"])
+        self.assertTrue(Client.objects.get(pk=client.pk).contract_expiring)
+
+
+class BenchmarkRoutesCommandTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_superuser()
+        seed_dataset(clients=50, adverts=3, contracts=5, services=2)
+
+    def test_seeded_dataset(self):
+        self.assertEqual(Client.objects.count(), 50)
+        self.assertEqual(get_statistics()["snapshot"].active_clients, Client.objects.filter(active=True).count())
+        self.assertFalse(Contract.objects.filter(expires_at=None).exists())
+
+    def test_json_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            call_command(
+                "benchmark_routes",
+                routes="active_list,contract_document",
+                requests=3,
+                warmup=0,
+                output=output,
+                stdout=StringIO(),
+            )
+            with open(output) as file:
+                report = json.load(file)
+        self.assertEqual(report["rows"]["Client"], 50)
+        active_list, document = report["routes"]
+        self.assertEqual(active_list["route"], "active_list")
+        self.assertLessEqual(active_list["queries_max"], active_list["query_budget"])
+        self.assertLessEqual(active_list["p50_ms"], active_list["p99_ms"])
+        self.assertIn("error", document)
+
+
+class SeedCommandTestCase(TestCase):
+    def seed(self, **options):
+        call_command("seed_crm", clients=200, adverts=5, contracts=20, services=3, stdout=StringIO(), **options)
+
+    def test_counts_and_values(self):
+        self.seed(active_ratio=0.5, chunk_size=64)
+        self.assertEqual(Client.objects.count(), 200)
+        self.assertEqual(Contract.objects.count(), 20)
+        self.assertEqual(Service.objects.count(), 3)
+        self.assertTrue(70 < Client.objects.filter(active=True).count() < 130)
+        self.assertFalse(Client.objects.filter(active=False, contract__isnull=False).exists())
+        client = Client.objects.first()
+        self.assertRegex(client.surname, r"^[А-ЯЁ][а-яё]+$")
+        self.assertRegex(client.phone_digits, r"^79\d{9}$")
+        contract = Contract.objects.first()
+        self.assertEqual(contract.expires_at, contract.created_at + timedelta(days=contract.validity_period))
+        self.assertEqual(get_statistics()["snapshot"].active_clients, Client.objects.filter(active=True).count())
+
+    def test_deterministic(self):
+        fields = ("surname", "name", "middle_name", "phone_num", "email", "active")
+        self.seed(seed=7)
+        first = list(Client.objects.order_by("pk").values_list(*fields))
+        Client.objects.all().delete()
+        self.seed(seed=7)
+        self.assertEqual(list(Client.objects.order_by("pk").values_list(*fields)), first)
+
+
+class BulkOperationsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_superuser()
+        cls.service, cls.other = make_services(2, description="old")
+        cls.advert, cls.unused = make_adverts(2, budget=40)
+        cls.contract, cls.unsigned = make_contracts(2, price=15)
+        make_clients(2, advert=cls.advert, contract=cls.contract)
+
+    def setUp(self) -> None:
+        self.client.force_login(self.user)
+        rebuild_statistics()
+
+    def post(self, route, payload):
+        return self.client.post(reverse(route), json.dumps(payload), content_type="application/json")
+
+    def test_create_update_delete(self):
+        response = self.post("app:services_bulk", {
+            "create": [{"name": "first", "description": "", "price": "10.50"}, {"name": "second", "price": 5}],
+            "update": [{"id": self.service.pk, "name": "renamed"}],
+            "delete": [self.other.pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(len(result["created"]), 2)
+        self.assertEqual((result["updated"], result["deleted"]), ([self.service.pk], [self.other.pk]))
+        self.assertEqual(
+            list(Service.objects.filter(pk__in=result["created"]).order_by("pk").values_list("name", "price")),
+            [("first", Decimal("10.50")), ("second", Decimal("5"))],
+        )
+        service = Service.objects.get(pk=self.service.pk)
+        self.assertEqual((service.name, service.description), ("renamed", "old"))
+        self.assertGreater(service.updated_at, self.service.updated_at)
+        self.assertFalse(Service.objects.filter(pk=self.other.pk).exists())
+
+    def test_queries_do_not_grow_with_rows(self):
+        tables = {
+            "app:services_bulk": (make_services, {"price": 1}),
+            "app:adverts_bulk": (partial(make_adverts, budget=20), {"description": "", "channel": "tv", "budget": 10}),
+            "app:contracts_bulk": (partial(make_contracts, price=30), {"created_at": "2024-01-01T00:00:00Z", "validity_period": 30, "price": 25}),
+        }
+
+        def queries(route, rows):
+            make, fields = tables[route]
+            payload = {
+                "create": [{"name": f"new{row}", **fields} for row in range(rows)],
+                "update": [{"id": obj.pk, "name": "renamed"} for obj in make(rows)],
+                "delete": [obj.pk for obj in make(rows)],
+            }
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.post(route, payload).status_code, 200)
+            return len(context)
+
+        for route in tables:
+            with self.subTest(route):
+                self.assertEqual(queries(route, 2), queries(route, 50))
+
+    def test_invalid_rows_apply_nothing(self):
+        response = self.post("app:services_bulk", {
+            "create": [{"name": "valid", "price": 1}, {"name": "", "price": "abc"}, {"name": "x", "price": 1, "id": 5}],
+            "update": [{"id": 0, "name": "missing"}, {"name": "no id"}],
+            "delete": [self.service.pk],
+        })
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]
+        self.assertEqual(
+            [(error["action"], error["row"]) for error in errors],
+            [("create", 1), ("create", 2), ("update", 0), ("update", 1)],
+        )
+        self.assertEqual(set(errors[0]["errors"]), {"name", "price"})
+        self.assertEqual(errors[1]["errors"]["id"][0]["code"], "unknown")
+        self.assertEqual(errors[2]["id"], 0)
+        self.assertFalse(Service.objects.filter(name="valid").exists())
+        self.assertTrue(Service.objects.filter(pk=self.service.pk).exists())
+
+    def test_protected_rows_reported(self):
+        response = self.post("app:adverts_bulk", {
+            "create": [{"name": "new", "description": "", "channel": "tv", "budget": 100}],
+            "delete": [self.advert.pk, self.unused.pk],
+        })
+        self.assertEqual(response.status_code, 400)
+        error, = response.json()["errors"]
+        self.assertEqual((error["action"], error["row"], error["id"]), ("delete", 0, self.advert.pk))
+        self.assertEqual(error["errors"]["__all__"][0]["code"], "protected")
+        self.assertEqual(Advert.objects.count(), 2)
+
+        response = self.post("app:contracts_bulk", {"delete": [self.contract.pk]})
+        self.assertEqual(response.json()["errors"][0]["errors"]["__all__"][0]["code"], "protected")
+
+    def test_statistics_follow_bulk_writes(self):
+        response = self.post("app:adverts_bulk", {
+            "create": [{"name": f"advert{row}", "description": "", "channel": "tv", "budget": 10} for row in range(3)],
+            "delete": [self.unused.pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(AdvertStatistics.objects.filter(advert_id=self.unused.pk).exists())
+        response = self.post("app:contracts_bulk", {
+            "create": [{"name": "contract", "created_at": "2024-01-01T00:00:00Z", "validity_period": 30, "price": 25}],
+            "delete": [self.unsigned.pk],
+        })
+        contract = Contract.objects.get(pk=response.json()["created"][0])
+        self.assertEqual(contract.expires_at, contract.created_at + timedelta(days=30))
+
+        statistics = get_statistics()
+        incremental = (statistics["snapshot"].advert_budget, statistics["snapshot"].contract_revenue, len(statistics["adverts"]))
+        rebuild_statistics()
+        statistics = get_statistics()
+        self.assertEqual(
+            incremental,
+            (statistics["snapshot"].advert_budget, statistics["snapshot"].contract_revenue, len(statistics["adverts"])),
+        )
+
+    def test_delete_invalidates_fragments(self):
+        generations = get_generations(Advert)
+        self.assertEqual(self.post("app:adverts_bulk", {"delete": [self.unused.pk]}).status_code, 200)
+        self.assertNotEqual(get_generations(Advert), generations)
+
+    def test_malformed_request(self):
+        response = self.client.post(reverse("app:adverts_bulk"), "[1, 2", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.json())
+        with override_settings(BULK_MAX_ROWS=1):
+            response = self.post("app:adverts_bulk", {"delete": [1, 2]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_role_required(self):
+        marketer = make_user("marketer")
+        marketer.groups.add(Group.objects.create(name="marketer"))
+        self.client.force_login(marketer)
+        self.assertEqual(self.client.get(reverse("app:services_bulk")).json()["update_fields"], ["name", "description"])
+        self.assertEqual(self.post("app:contracts_bulk", {"delete": [self.contract.pk]}).status_code, 403)
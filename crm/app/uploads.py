@@ -0,0 +1,21 @@
+import hashlib
+
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    # Every upload is spooled to a temporary file chunk by chunk, never held
+    # in memory, and its SHA-256 is computed on the way for the storage.
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.hasher.hexdigest()
+        return file
@@ -1,37 +1,54 @@
+from django.conf import settings
 from django.urls import path
 
+from .async_views import select_async_views
+
 from .views import (
     AdvertsListView,
     AdvertCreateView,
     AdvertDetailView,
     AdvertDeleteView,
     AdvertUpdateView,
+    AdvertBulkView,
 
     ContractsListView,
+    ContractsExportView,
+    ContractsExpiringView,
     ContractCreateView,
     ContractDetailView,
+    ContractDocumentView,
     ContractDeleteView,
     ContractUpdateView,
+    ContractBulkView,
 
     ServicesListView,
     ServiceCreateView,
     ServiceDetailView,
     ServiceDeleteView,
     ServiceUpdateView,
+    ServiceBulkView,
 
     PotentialClientListView,
+    PotentialClientExportView,
     PotentialClientUpdateView,
     PotentialClientCreateView,
     PotentialClientDetailView,
+    ClientImportView,
 
     ActiveClientDetailView,
     ActiveClientListView,
+    ActiveClientExportView,
     ActiveClientCreateView,
     ActiveClientUpdateView,
     ClientDeleteView,
     MakeClientActiveView,
+    ClientPromoteView,
+    ClientSearchView,
+    ClientHistoryView,
 
     StatisticsView,
+    StatisticsExportView,
+    MetricsView,
 )
 
 app_name = 'app'
@@ -42,30 +59,47 @@ urlpatterns = [
     path("adverts/<int:pk>/", AdvertDetailView.as_view(), name="advert_details"),
     path("adverts/<int:pk>/confirm-delete/", AdvertDeleteView.as_view(), name="delete_advert"),
     path("adverts/<int:pk>/update/", AdvertUpdateView.as_view(), name="update_advert"),
+    path("adverts/bulk/", AdvertBulkView.as_view(), name="adverts_bulk"),
 
     path("contracts/", ContractsListView.as_view(), name="contracts_list"),
+    path("contracts/export/", ContractsExportView.as_view(), name="contracts_export"),
+    path("contracts/expiring/", ContractsExpiringView.as_view(), name="contracts_expiring"),
     path("contract_create/", ContractCreateView.as_view(), name="create_contract"),
     path("contracts/<int:pk>/", ContractDetailView.as_view(), name="contract_details"),
+    path("contracts/<int:pk>/document/", ContractDocumentView.as_view(), name="contract_document"),
     path("contracts/<int:pk>/confirm-delete/", ContractDeleteView.as_view(), name="delete_contract"),
     path("contracts/<int:pk>/update/", ContractUpdateView.as_view(), name="update_contract"),
+    path("contracts/bulk/", ContractBulkView.as_view(), name="contracts_bulk"),
 
     path("services/", ServicesListView.as_view(), name="services_list"),
     path("service_create/", ServiceCreateView.as_view(), name="create_service"),
     path("services/<int:pk>/", ServiceDetailView.as_view(), name="service_details"),
     path("services/<int:pk>/confirm-delete/", ServiceDeleteView.as_view(), name="delete_service"),
     path("services/<int:pk>/update/", ServiceUpdateView.as_view(), name="update_service"),
+    path("services/bulk/", ServiceBulkView.as_view(), name="services_bulk"),
 
     path("potential/", PotentialClientListView.as_view(), name="potential_list"),
+    path("potential/export/", PotentialClientExportView.as_view(), name="potential_export"),
     path("potential/create/", PotentialClientCreateView.as_view(), name="potential_create"),
+    path("potential/import/", ClientImportView.as_view(), name="potential_import"),
     path("potential/<int:pk>/", PotentialClientDetailView.as_view(), name="potential_details"),
     path("potential/<int:pk>/update/", PotentialClientUpdateView.as_view(), name="update_potential"),
     path("potential/<int:pk>/confirm-active/", MakeClientActiveView.as_view(), name="confirm_active"),
+    path("potential/promote/", ClientPromoteView.as_view(), name="promote_clients"),
 
     path("active/", ActiveClientListView.as_view(), name="active_list"),
+    path("active/export/", ActiveClientExportView.as_view(), name="active_export"),
     path("active/create/", ActiveClientCreateView.as_view(), name="create_active"),
     path("active/<int:pk>/update/", ActiveClientUpdateView.as_view(), name="update_active"),
     path("active/<int:pk>/", ActiveClientDetailView.as_view(), name="active_details"),
     path("active/<int:pk>/confirm-delete/", ClientDeleteView.as_view(), name="delete_client"),
 
+    path("clients/search/", ClientSearchView.as_view(), name="client_search"),
+    path("clients/<int:pk>/history/", ClientHistoryView.as_view(), name="client_history"),
+
     path("statistics/", StatisticsView.as_view(), name="statistics"),
+    path("statistics/export/", StatisticsExportView.as_view(), name="statistics_export"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ]
+
+urlpatterns = select_async_views(urlpatterns, settings.ASYNC_VIEWS)
@@ -1,56 +1,66 @@
 from itertools import chain
 
-from django.contrib.auth.mixins import UserPassesTestMixin
-from django.db.models import Count, Sum
-from django.http import HttpResponseRedirect
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.urls import reverse_lazy, reverse
-from django.views.generic import CreateView, DetailView, UpdateView, ListView, DeleteView
-
-from .models import Advert, Contract, Service, Client
-
-
-class AdvertsListView(UserPassesTestMixin, ListView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="marketer")\
-                   .exists() \
-               or self.request.user.is_superuser
+from django.views.generic import CreateView, DetailView, UpdateView, ListView, DeleteView, FormView, View
+from django.views.generic.detail import SingleObjectMixin
+
+from . import metrics, statistics
+from .bulk import BulkOperationsMixin
+from .cache import FragmentCacheMixin
+from .conditional import ConditionalDetailMixin, ConditionalListMixin
+from .downloads import document_response
+from .expiry import expiring_contracts
+from .exports import ExportMixin
+from .forms import ClientImportForm, ClientPromoteForm
+from .imports import ErrorPreview, import_clients, iter_rows
+from .models import Advert, Contract, Service, Client, ClientEvent, contract_expiry
+from .pagination import KeysetPaginationMixin
+from .promotion import promote_clients
+from .roles import RoleRequiredMixin
+from .search import search_clients
+from .statistics import advert_statistics, get_statistics
+
+
+class AdvertsListView(
+    RoleRequiredMixin,
+    ConditionalListMixin,
+    FragmentCacheMixin,
+    KeysetPaginationMixin,
+    ListView,
+):
+    allowed_roles = ("marketer",)
+    query_budget = 4
     template_name = "app/adverts_list.html"
+    fragment_template_name = "app/advert_rows.html"
+    fragment_models = (Advert,)
     context_object_name = "adverts"
     queryset = Advert.objects.values("pk", "name").all()
 
 
-class AdvertDetailView(UserPassesTestMixin, DetailView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="marketer")\
-                   .exists() \
-               or self.request.user.is_superuser
+class AdvertDetailView(RoleRequiredMixin, ConditionalDetailMixin, DetailView):
+    allowed_roles = ("marketer",)
+    query_budget = 5
     template_name = "app/advert_details.html"
     model = Advert
     context_object_name = "advert"
 
 
-class AdvertCreateView(UserPassesTestMixin, CreateView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="marketer")\
-                   .exists() \
-               or self.request.user.is_superuser
+class AdvertCreateView(RoleRequiredMixin, CreateView):
+    allowed_roles = ("marketer",)
+    query_budget = 3
     model = Advert
     fields = "name", "description", "channel", "budget"
     success_url = reverse_lazy("app:adverts_list")
 
 
-class AdvertUpdateView(UserPassesTestMixin, UpdateView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="marketer")\
-                   .exists() \
-               or self.request.user.is_superuser
+class AdvertUpdateView(RoleRequiredMixin, UpdateView):
+    allowed_roles = ("marketer",)
+    query_budget = 4
     model = Advert
     fields = "name", "description"
-    template_name = "app/advert_update_form"
+    template_name = "app/advert_update_form.html"
 
     def get_success_url(self):
         return reverse(
@@ -60,53 +70,106 @@ class AdvertUpdateView(UserPassesTestMixin, UpdateView):
 
 
 class AdvertDeleteView(DeleteView):
+    query_budget = 1
     model = Advert
     success_url = reverse_lazy("app:adverts_list")
     template_name = "app/confirm_advert_delete.html"
 
 
-class ContractsListView(UserPassesTestMixin, ListView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="manager")\
-                   .exists() \
-               or self.request.user.is_superuser
+class AdvertBulkView(RoleRequiredMixin, BulkOperationsMixin, View):
+    allowed_roles = ("marketer",)
+    query_budget = 3
+    model = Advert
+    create_fields = AdvertCreateView.fields
+    update_fields = AdvertUpdateView.fields
+    snapshot_fields = {"advert_budget": "budget"}
+
+    def create_objects(self, adverts):
+        adverts = super().create_objects(adverts)
+        statistics.adverts_created(adverts)
+        return adverts
+
+
+class ContractsListView(
+    RoleRequiredMixin,
+    ConditionalListMixin,
+    FragmentCacheMixin,
+    KeysetPaginationMixin,
+    ListView,
+):
+    allowed_roles = ("manager",)
+    query_budget = 4
     template_name = "app/contracts_list.html"
+    fragment_template_name = "app/contract_rows.html"
+    fragment_models = (Contract,)
     context_object_name = "contracts"
     queryset = Contract.objects.values("pk", "name").all()
 
 
-class ContractDetailView(UserPassesTestMixin, DetailView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="manager")\
-                   .exists() \
-               or self.request.user.is_superuser
+class ContractsExpiringView(RoleRequiredMixin, KeysetPaginationMixin, ListView):
+    allowed_roles = ("manager",)
+    query_budget = 4
+    model = Contract
+    template_name = "app/contracts_expiring.html"
+    context_object_name = "contracts"
+    keyset_fields = ("expires_at", "pk")
+
+    def get_queryset(self):
+        return expiring_contracts().values("pk", "name", "expires_at")
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(days=settings.CONTRACT_EXPIRY_DAYS, **kwargs)
+
+
+class ContractsExportView(RoleRequiredMixin, ExportMixin, View):
+    allowed_roles = ("manager",)
+    query_budget = 4
+    list_view = ContractsListView
+    export_name = "contracts"
+    export_fields = ("id", "name", "description", "created_at", "validity_period", "price")
+
+
+class ContractDetailView(RoleRequiredMixin, ConditionalDetailMixin, DetailView):
+    allowed_roles = ("manager",)
+    query_budget = 5
     template_name = "app/contract_details.html"
     model = Contract
     context_object_name = "contract"
 
 
-class ContractCreateView(UserPassesTestMixin, CreateView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="manager")\
-                   .exists() \
-               or self.request.user.is_superuser
+class ContractCreateView(RoleRequiredMixin, CreateView):
+    allowed_roles = ("manager",)
+    query_budget = 3
     model = Contract
     fields = "name", "description", "document", "created_at", "validity_period", "price"
     success_url = reverse_lazy("app:contracts_list")
 
+    def form_valid(self, form):
+        document = form.cleaned_data["document"]
+        if document:
+            # The stored file is named after its content hash.
+            form.instance.document_name = document.name
+        return super().form_valid(form)
+
+
+class ContractDocumentView(RoleRequiredMixin, SingleObjectMixin, View):
+    allowed_roles = ("manager",)
+    query_budget = 4
+    # Contracts without a document are a 404.
+    queryset = Contract.objects.filter(document__gt="").only("document", "document_name")
 
-class ContractUpdateView(UserPassesTestMixin, UpdateView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="manager")\
-                   .exists() \
-               or self.request.user.is_superuser
+    def get(self, request, *args, **kwargs):
+        contract = self.get_object()
+        filename = contract.document_name or contract.document.name.rsplit("/", 1)[-1]
+        return document_response(request, contract.document, filename)
+
+
+class ContractUpdateView(RoleRequiredMixin, UpdateView):
+    allowed_roles = ("manager",)
+    query_budget = 4
     model = Contract
     fields = "name", "description"
-    template_name = "app/contract_update_form"
+    template_name = "app/contract_update_form.html"
 
     def get_success_url(self):
         return reverse(
@@ -116,50 +179,64 @@ class ContractUpdateView(UserPassesTestMixin, UpdateView):
 
 
 class ContractDeleteView(DeleteView):
+    query_budget = 1
     model = Contract
     success_url = reverse_lazy("app:contracts_list")
-    template_name = "contracts/confirm_contract_delete.html"
+    template_name = "app/confirm_contract_delete.html"
 
 
-class ServicesListView(UserPassesTestMixin, ListView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="marketer")\
-                   .exists() \
-               or self.request.user.is_superuser
+class ContractBulkView(RoleRequiredMixin, BulkOperationsMixin, View):
+    allowed_roles = ("manager",)
+    query_budget = 3
+    model = Contract
+    # Documents are uploaded through the contract form.
+    create_fields = tuple(field for field in ContractCreateView.fields if field != "document")
+    update_fields = ContractUpdateView.fields
+    snapshot_fields = {"contract_revenue": "price"}
+
+    def create_objects(self, contracts):
+        for contract in contracts:
+            contract.expires_at = contract_expiry(contract.created_at, contract.validity_period)
+        contracts = super().create_objects(contracts)
+        statistics.contracts_created(contracts)
+        return contracts
+
+
+class ServicesListView(
+    RoleRequiredMixin,
+    ConditionalListMixin,
+    FragmentCacheMixin,
+    KeysetPaginationMixin,
+    ListView,
+):
+    allowed_roles = ("marketer",)
+    query_budget = 4
     template_name = "app/services_list.html"
+    fragment_template_name = "app/service_rows.html"
+    fragment_models = (Service,)
     context_object_name = "services"
     queryset = Service.objects.values("pk", "name").all()
 
 
-class ServiceDetailView(UserPassesTestMixin, DetailView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="marketer")\
-                   .exists() \
-               or self.request.user.is_superuser
+class ServiceDetailView(RoleRequiredMixin, ConditionalDetailMixin, DetailView):
+    allowed_roles = ("marketer",)
+    query_budget = 5
     template_name = "app/service_details.html"
     model = Service
     context_object_name = "service"
 
 
-class ServiceCreateView(UserPassesTestMixin, CreateView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="marketer")\
-                   .exists() \
-               or self.request.user.is_superuser
+class ServiceCreateView(RoleRequiredMixin, CreateView):
+    allowed_roles = ("marketer",)
+    query_budget = 3
     model = Service
     fields = "name", "description", "price"
     success_url = reverse_lazy("app:services_list")
 
 
-class ServiceUpdateView(UserPassesTestMixin, UpdateView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="marketer")\
-                   .exists() \
-               or self.request.user.is_superuser
+class ServiceUpdateView(RoleRequiredMixin, UpdateView):
+    allowed_roles = ("marketer",)
+    query_budget = 4
     model = Service
     fields = "name", "description"
     template_name = "app/service_update_form.html"
@@ -172,33 +249,52 @@ class ServiceUpdateView(UserPassesTestMixin, UpdateView):
 
 
 class ServiceDeleteView(DeleteView):
+    query_budget = 1
     model = Service
     success_url = reverse_lazy("app:services_list")
     template_name = "app/confirm_service_delete.html"
 
 
-class PotentialClientListView(UserPassesTestMixin, ListView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="manager")\
-                   .exists() or self.request.user.groups\
-                   .filter(name="manager")\
-                   .exists() or self.request.user.is_superuser
+class ServiceBulkView(RoleRequiredMixin, BulkOperationsMixin, View):
+    allowed_roles = ("marketer",)
+    query_budget = 3
+    model = Service
+    create_fields = ServiceCreateView.fields
+    update_fields = ServiceUpdateView.fields
+
+
+class PotentialClientListView(
+    RoleRequiredMixin,
+    ConditionalListMixin,
+    FragmentCacheMixin,
+    KeysetPaginationMixin,
+    ListView,
+):
+    allowed_roles = ("manager",)
+    query_budget = 4
     template_name = "app/potential_list.html"
+    fragment_template_name = "app/potential_rows.html"
+    fragment_models = (Client,)
     queryset = (
         Client.objects
         .values("pk", "name", "surname", "middle_name")
         .filter(active=False)
     )
+    keyset_fields = ("surname", "name", "pk")
     context_object_name = "clients"
 
 
-class PotentialClientCreateView(UserPassesTestMixin, CreateView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="operator")\
-                   .exists() \
-               or self.request.user.is_superuser
+class PotentialClientExportView(RoleRequiredMixin, ExportMixin, View):
+    allowed_roles = ("manager",)
+    query_budget = 4
+    list_view = PotentialClientListView
+    export_name = "potential-clients"
+    export_fields = ("id", "surname", "name", "middle_name", "phone_num", "email", "advert__name")
+
+
+class PotentialClientCreateView(RoleRequiredMixin, CreateView):
+    allowed_roles = ("operator",)
+    query_budget = 4
     model = Client
     fields = [
         "name",
@@ -211,24 +307,22 @@ class PotentialClientCreateView(UserPassesTestMixin, CreateView):
     success_url = reverse_lazy("app:potential_list")
 
 
-class PotentialClientDetailView(UserPassesTestMixin, DetailView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="operator")\
-                   .exists() or self.request.user.groups\
-                   .filter(name="manager")\
-                   .exists() or self.request.user.is_superuser
+class PotentialClientDetailView(RoleRequiredMixin, ConditionalDetailMixin, DetailView):
+    allowed_roles = ("operator", "manager")
+    query_budget = 5
     template_name = "app/potential_details.html"
-    model = Client
+    last_modified_fields = ("updated_at", "advert__updated_at")
+    queryset = (
+        Client.objects
+        .select_related("advert")
+        .only("name", "surname", "middle_name", "phone_num", "email", "advert__name")
+    )
     context_object_name = "client"
 
 
-class PotentialClientUpdateView(UserPassesTestMixin, UpdateView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="operator")\
-                   .exists() \
-               or self.request.user.is_superuser
+class PotentialClientUpdateView(RoleRequiredMixin, UpdateView):
+    allowed_roles = ("operator",)
+    query_budget = 5
     model = Client
     fields = [
         "name",
@@ -247,35 +341,93 @@ class PotentialClientUpdateView(UserPassesTestMixin, UpdateView):
         )
 
 
-class MakeClientActiveView(UserPassesTestMixin, UpdateView):
-    def test_func(self):
-        return self.request.user.groups\
-                   .filter(name="manager")\
-                   .exists() \
-               or self.request.user.is_superuser
+class ClientImportView(RoleRequiredMixin, FormView):
+    allowed_roles = ("operator",)
+    query_budget = 3
+    form_class = ClientImportForm
+    template_name = "app/client_import.html"
+    error_preview_size = 50
+
+    def form_valid(self, form):
+        upload = form.cleaned_data["file"]
+        errors = ErrorPreview(self.error_preview_size)
+        try:
+            result = import_clients(
+                iter_rows(upload.open("rb"), upload.name),
+                batch_size=settings.IMPORT_BATCH_SIZE,
+                active=form.cleaned_data["active"],
+                error_writer=errors,
+            )
+        except (UnicodeDecodeError, ValueError) as error:
+            form.add_error("file", str(error))
+            return self.form_invalid(form)
+        return self.render_to_response(self.get_context_data(form=form, result=result, errors=errors.rows))
+
+
+class MakeClientActiveView(RoleRequiredMixin, UpdateView):
+    allowed_roles = ("manager",)
+    query_budget = 4
     model = Client
     fields = ("active",)
     success_url = reverse_lazy("app:potential_list")
     template_name = "app/confirm_active.html"
 
     def form_valid(self, form):
-        success_url = self.get_success_url()
-        self.object.active = True
-        self.object.save()
-        return HttpResponseRedirect(success_url)
+        # Not self.object.save(): the page may have been loaded before another
+        # request promoted the client, and the counters would add it twice.
+        promote_clients(Client.objects.filter(pk=self.object.pk))
+        return HttpResponseRedirect(self.get_success_url())
+
+
+class ClientPromoteView(RoleRequiredMixin, FormView):
+    allowed_roles = ("manager",)
+    query_budget = 4
+    form_class = ClientPromoteForm
+    template_name = "app/client_promote.html"
+    success_url = reverse_lazy("app:potential_list")
+
+    def form_valid(self, form):
+        promote_clients(form.get_queryset())
+        return super().form_valid(form)
 
 
-class ActiveClientListView(ListView):
+class ActiveClientListView(
+    ConditionalListMixin,
+    FragmentCacheMixin,
+    KeysetPaginationMixin,
+    ListView,
+):
+    query_budget = 2
     template_name = "app/active_list.html"
+    fragment_template_name = "app/active_rows.html"
+    fragment_models = (Client,)
     queryset = (
         Client.objects
         .values("pk", "name", "surname", "middle_name")
         .filter(active=True)
     )
+    keyset_fields = ("surname", "name", "pk")
     context_object_name = "clients"
 
 
+class ActiveClientExportView(ExportMixin, View):
+    query_budget = 3
+    list_view = ActiveClientListView
+    export_name = "active-clients"
+    export_fields = (
+        "id",
+        "surname",
+        "name",
+        "middle_name",
+        "phone_num",
+        "email",
+        "advert__name",
+        "contract__name",
+    )
+
+
 class ActiveClientCreateView(CreateView):
+    query_budget = 2
     model = Client
     fields = [
         "name",
@@ -290,6 +442,7 @@ class ActiveClientCreateView(CreateView):
 
 
 class ActiveClientUpdateView(UpdateView):
+    query_budget = 3
     model = Client
     fields = [
         "name",
@@ -310,33 +463,88 @@ class ActiveClientUpdateView(UpdateView):
         )
 
 
-class ActiveClientDetailView(DetailView):
+class ActiveClientDetailView(ConditionalDetailMixin, DetailView):
+    query_budget = 2
     template_name = "app/active_details.html"
-    model = Client
+    last_modified_fields = ("updated_at", "advert__updated_at", "contract__updated_at")
+    queryset = (
+        Client.objects
+        .select_related("advert", "contract")
+        .only(
+            "name",
+            "surname",
+            "middle_name",
+            "phone_num",
+            "email",
+            "contract_expiring",
+            "advert__name",
+            "contract__name",
+            "contract__expires_at",
+        )
+    )
     context_object_name = "client"
 
 
 class ClientDeleteView(DeleteView):
+    query_budget = 1
     model = Client
     success_url = reverse_lazy("app:active_list")
     template_name = "app/confirm_delete.html"
 
 
+class ClientHistoryView(RoleRequiredMixin, KeysetPaginationMixin, ListView):
+    allowed_roles = ("operator", "manager")
+    query_budget = 4
+    template_name = "app/client_history.html"
+    model = ClientEvent
+    keyset_fields = ("created_at", "pk")
+    keyset_descending = True
+    context_object_name = "events"
+
+    def get_queryset(self):
+        # Served by client_event_timeline_idx; works for deleted clients too.
+        return ClientEvent.objects.filter(client_id=self.kwargs["pk"])
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(client_id=self.kwargs["pk"], **kwargs)
+
+
+class ClientSearchView(RoleRequiredMixin, View):
+    allowed_roles = ("operator", "manager")
+    query_budget = 3
+
+    def get(self, request):
+        active = {"1": True, "0": False}.get(request.GET.get("active"))
+        results = []
+        for client in search_clients(request.GET.get("q", ""), active=active):
+            route = "app:active_details" if client["active"] else "app:potential_details"
+            results.append(dict(client, url=reverse(route, kwargs={"pk": client["pk"]})))
+        return JsonResponse({"results": results})
+
+
 class StatisticsView(ListView):
+    query_budget = 2
     template_name = "app/statistics.html"
     context_object_name = "adverts"
 
     def get_queryset(self):
-        advert_client_queryset = Advert.objects.annotate(
-            client_cnt=Count("client"),
-        )
-        client_queryset = Client.objects.filter(active=True).count()
-        advert_queryset = Advert.objects.aggregate(Sum('budget'))
-        contract_queryset = Contract.objects.aggregate(Sum('price'))
-        context_queryset = {
-            "advert_client": advert_client_queryset,
-            "client": client_queryset,
-            "advert": advert_queryset,
-            "contract": contract_queryset,
-        }
-        return context_queryset
+        return get_statistics()
+
+
+class StatisticsExportView(ExportMixin, View):
+    query_budget = 3
+    export_name = "statistics"
+    export_fields = ("name", "budget", "client_count", "converted_count", "revenue", "cost_per_acquisition")
+
+    def get_queryset(self):
+        return advert_statistics()
+
+
+class MetricsView(RoleRequiredMixin, View):
+    query_budget = 2
+
+    def get(self, request):
+        summary = metrics.summarize()
+        if request.GET.get("format") == "prometheus":
+            return HttpResponse(metrics.to_prometheus(summary), content_type="text/plain; version=0.0.4")
+        return JsonResponse(summary)
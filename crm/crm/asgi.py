@@ -11,6 +11,10 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from crm.sentry import init_sentry
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "crm.settings")
 
+init_sentry()
+
 application = get_asgi_application()
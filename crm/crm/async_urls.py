@@ -0,0 +1,12 @@
+from django.contrib import admin
+from django.urls import path, include
+
+from app.async_views import select_async_views
+from app.urls import urlpatterns as app_urlpatterns
+
+# The same routes as crm/urls.py with every async view variant enabled.
+urlpatterns = [
+    path("admin/", admin.site.urls),
+    path("app/", include((select_async_views(app_urlpatterns, {"all"}), "app"), namespace="app")),
+    path("myauth/", include("myauth.urls", namespace="myauth")),
+]
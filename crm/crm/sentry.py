@@ -0,0 +1,59 @@
+import sentry_sdk
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+HEAVY_ROUTES = {
+    "app:statistics",
+    "app:adverts_list",
+    "app:contracts_list",
+    "app:services_list",
+    "app:potential_list",
+    "app:active_list",
+}
+
+AUTH_ROUTES = {
+    "myauth:login",
+    "myauth:logout",
+}
+
+
+def request_path(sampling_context):
+    environ = sampling_context.get("wsgi_environ")
+    if environ is not None:
+        return environ.get("PATH_INFO")
+    scope = sampling_context.get("asgi_scope")
+    if scope is not None:
+        return scope.get("path")
+    return None
+
+
+def traces_sampler(sampling_context):
+    parent_sampled = sampling_context.get("parent_sampled")
+    if parent_sampled is not None:
+        return float(parent_sampled)
+
+    path = request_path(sampling_context)
+    if path is None:
+        return settings.SENTRY_TRACES_SAMPLE_RATE
+    if path.startswith("/" + settings.STATIC_URL.lstrip("/")) or path == "/favicon.ico":
+        return 0.0
+    try:
+        view_name = resolve(path).view_name
+    except Resolver404:
+        return 0.0
+    if view_name in HEAVY_ROUTES:
+        return settings.SENTRY_HEAVY_TRACES_SAMPLE_RATE
+    if view_name in AUTH_ROUTES:
+        return settings.SENTRY_AUTH_TRACES_SAMPLE_RATE
+    return settings.SENTRY_TRACES_SAMPLE_RATE
+
+
+def init_sentry():
+    # Called from wsgi.py/asgi.py so management commands and tests never load the SDK.
+    if settings.SENTRY_MODE == "off" or not settings.SENTRY_DSN:
+        return
+    sentry_sdk.init(
+        dsn=settings.SENTRY_DSN,
+        traces_sampler=traces_sampler,
+        profiles_sample_rate=settings.SENTRY_PROFILES_SAMPLE_RATE,
+    )
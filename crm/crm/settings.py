@@ -12,8 +12,9 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
-import sentry_sdk
 from dotenv import load_dotenv
 from django.utils.translation import gettext_lazy as _
 
@@ -50,16 +51,20 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "app.apps.AppConfig",
     "myauth.apps.MyauthConfig",
 ]
 
 MIDDLEWARE = [
+    "app.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "app.middleware.ReplicaRoutingMiddleware",
+    "app.middleware.ClientEventMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -91,16 +96,89 @@ WSGI_APPLICATION = "crm.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+#
+# CONN_MAX_AGE keeps a connection open for that many seconds across requests
+# (0 closes it after every request) and CONN_HEALTH_CHECKS pings a reused
+# connection before the request uses it. DB_POOL picks a pooling mode:
+#   off        persistent connections only;
+#   pgbouncer  connect through PgBouncer in transaction pooling mode, where a
+#              server-side cursor does not survive its transaction, so they are
+#              disabled (exports then stream best with EXPORT_COPY=on).
+
+DB_POOL = os.environ.get("DB_POOL", "off")
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
         "NAME": NAME,
         "USER": USER,
         "PASSWORD": PASSWORD,
-        "HOST": HOST
+        "HOST": HOST,
+        "PORT": os.environ.get("DB_PORT", ""),
+        "CONN_MAX_AGE": int(os.environ.get("CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": os.environ.get("CONN_HEALTH_CHECKS", "on") == "on",
+        "OPTIONS": {},
     }
 }
 
+# Django's own pool (OPTIONS["pool"]) needs Django 5.1 and psycopg 3; with
+# Django 5.0 and psycopg2 pinned, pooling is left to PgBouncer.
+if DB_POOL == "pgbouncer":
+    DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = True
+elif DB_POOL != "off":
+    raise ImproperlyConfigured(f"Unknown DB_POOL mode {DB_POOL!r}, expected off or pgbouncer")
+
+# Read replicas: REPLICA_HOSTS is a comma separated list of hosts that serve
+# the same database as HOST. GET requests to list, detail and statistics
+# pages read app data from a random replica; everything else, and every
+# request for REPLICA_STICKY_SECONDS after the browser made a write, uses
+# the primary. Cached list rows are always built from the primary, since
+# they are shared by every user. In tests the replicas mirror the default
+# database.
+
+REPLICA_HOSTS = [host.strip() for host in os.environ.get("REPLICA_HOSTS", "").split(",") if host.strip()]
+DATABASE_REPLICAS = []
+for number, replica_host in enumerate(REPLICA_HOSTS, start=1):
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "HOST": replica_host,
+        "OPTIONS": dict(DATABASES["default"]["OPTIONS"]),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{number}")
+
+DATABASE_ROUTERS = ["app.routers.ReplicaRouter"]
+REPLICA_STICKY_COOKIE = "crm_primary"
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+#
+# Rendered list rows live in the "fragments" cache, keyed by per-model
+# generation counters. Those counters are only shared between worker
+# processes by the file and redis backends; locmem suits tests and a single
+# runserver process.
+
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "fragments": {
+        "BACKEND": CACHE_BACKENDS[os.environ.get("FRAGMENT_CACHE_BACKEND", "locmem")],
+        "LOCATION": os.environ.get("FRAGMENT_CACHE_LOCATION", "fragments"),
+    },
+}
+
+FRAGMENT_CACHE_ALIAS = "fragments"
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get("FRAGMENT_CACHE_TIMEOUT", 3600))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -138,13 +216,72 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded contract documents. They are not served under a public URL: the
+# download view checks roles and either streams the file itself or, with
+# DOCUMENT_ACCEL_REDIRECT set to an internal nginx location aliased to
+# MEDIA_ROOT, hands it over with X-Accel-Redirect. Documents uploaded before
+# this default existed were stored relative to the working directory; move
+# them with "python manage.py move_documents".
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", BASE_DIR / "media")
+DOCUMENT_ACCEL_REDIRECT = os.environ.get("DOCUMENT_ACCEL_REDIRECT", "")
+
+# Uploads go to a temporary file in chunks and are hashed while written,
+# see app.uploads.
+FILE_UPLOAD_HANDLERS = ["app.uploads.HashingFileUploadHandler"]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
-sentry_sdk.init(
-    dsn="https://f4e326384f8ca72c80a09ff815887a00@o4506019603283968.ingest.us.sentry.io/4506899699597312",
-    traces_sample_rate=1.0,
-    profiles_sample_rate=1.0,
+# Seconds a user's group names stay in the per-process role cache.
+# Membership changes invalidate it immediately in the current process only.
+ROLE_CACHE_TTL = int(os.environ.get("ROLE_CACHE_TTL", 60))
+
+# Rows per page on the keyset-paginated list views.
+LIST_PAGE_SIZE = int(os.environ.get("LIST_PAGE_SIZE", 50))
+
+# Routes from app/urls.py served by their async views (comma separated
+# route names, or "all"). Only useful when running under ASGI.
+ASYNC_VIEWS = {name.strip() for name in os.environ.get("ASYNC_VIEWS", "").split(",") if name.strip()}
+
+# Maximum number of clients returned by the search endpoint.
+SEARCH_RESULTS_LIMIT = int(os.environ.get("SEARCH_RESULTS_LIMIT", 20))
+
+# Days ahead shown on the expiring contracts page and used by the
+# scan_contract_expiry command to mark clients (run it with --full after
+# changing this value).
+CONTRACT_EXPIRY_DAYS = int(os.environ.get("CONTRACT_EXPIRY_DAYS", 30))
+
+# Rows per bulk_create batch when importing clients.
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 1000))
+
+# Most rows (creates, updates and deletes together) one request to the bulk
+# endpoints of adverts, services and contracts may carry.
+BULK_MAX_ROWS = int(os.environ.get("BULK_MAX_ROWS", 1000))
+
+# Exports fetch EXPORT_CHUNK_SIZE rows per round trip and send the response
+# in blocks of about EXPORT_BUFFER_SIZE bytes. EXPORT_COPY=on streams CSV
+# exports with COPY ... TO STDOUT on PostgreSQL.
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 2000))
+EXPORT_BUFFER_SIZE = int(os.environ.get("EXPORT_BUFFER_SIZE", 64 * 1024))
+EXPORT_USE_COPY = os.environ.get("EXPORT_COPY", "off") == "on"
+
+# Share of requests whose query count, DB time, render time and latency are
+# recorded by RequestMetricsMiddleware, and how many samples are kept.
+METRICS_SAMPLE_RATE = float(os.environ.get("METRICS_SAMPLE_RATE", 1.0))
+METRICS_BUFFER_SIZE = int(os.environ.get("METRICS_BUFFER_SIZE", 10000))
+
+# Sentry is initialised by crm.sentry.init_sentry() from wsgi.py/asgi.py.
+# SENTRY_MODE=off skips it entirely, e.g. for benchmarking. Trace rates are
+# chosen per route by crm.sentry.traces_sampler; profiles are sampled from
+# the traced requests.
+SENTRY_MODE = os.environ.get("SENTRY_MODE", "on")
+SENTRY_DSN = os.environ.get(
+    "SENTRY_DSN",
+    "https://f4e326384f8ca72c80a09ff815887a00@o4506019603283968.ingest.us.sentry.io/4506899699597312",
 )
+SENTRY_TRACES_SAMPLE_RATE = float(os.environ.get("SENTRY_TRACES_SAMPLE_RATE", 0.05))
+SENTRY_HEAVY_TRACES_SAMPLE_RATE = float(os.environ.get("SENTRY_HEAVY_TRACES_SAMPLE_RATE", 0.2))
+SENTRY_AUTH_TRACES_SAMPLE_RATE = float(os.environ.get("SENTRY_AUTH_TRACES_SAMPLE_RATE", 0.01))
+SENTRY_PROFILES_SAMPLE_RATE = float(os.environ.get("SENTRY_PROFILES_SAMPLE_RATE", 0.1))
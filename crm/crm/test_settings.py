@@ -0,0 +1,23 @@
+from .settings import *  # noqa: F401,F403
+
+# Settings for a fast local test run that needs no PostgreSQL server:
+#   python manage.py test --settings=crm.test_settings --parallel
+# Every worker gets its own copy of the in-memory database. The plain
+# settings run the same suite against PostgreSQL configured in .env.
+
+SECRET_KEY = SECRET_KEY or "test"
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": ":memory:",
+    }
+}
+DATABASE_REPLICAS = []
+
+CACHES["fragments"] = {
+    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    "LOCATION": "fragments",
+}
+
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]